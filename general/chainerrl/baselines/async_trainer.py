@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+def train_agent_with_learner_thread(
+        agent, env, steps, outdir,
+        update_interval, replay_start_size, minibatch_size,
+        max_episode_len=None):
+    """Train an agent while running gradient updates on a learner thread.
+
+    The main (actor) thread interacts with the env and fills the replay
+    buffer; a learner thread samples minibatches and updates the model.
+    Both serialize access to the agent with a lock, so while the env
+    simulates a step (I/O bound, outside the lock) the learner can run a
+    GPU update, overlapping the two instead of interleaving them serially.
+
+    The learner paces itself to the same schedule as the synchronous loop:
+    one update every `update_interval` env steps after `replay_start_size`
+    transitions have been collected.
+
+    Args:
+        agent: chainerrl agent. Its own replay updater must be disabled
+            (e.g. by a very large `update_interval`) so that
+            `act_and_train` only acts.
+        env: gym env.
+        steps (int): Number of env steps to train for.
+        outdir (str): Directory where the final agent is saved.
+        update_interval (int): Env steps per gradient update.
+        replay_start_size (int): Minimum buffer size before updates start.
+        minibatch_size (int): Minibatch size for updates.
+        max_episode_len (int or None): Maximum episode length.
+    """
+
+    lock = threading.Lock()
+    stop_event = threading.Event()
+    rbuf = agent.replay_buffer
+    n_updates = [0]
+    learner_exception = []
+
+    def learner_loop():
+        try:
+            while not stop_event.is_set():
+                wanted = max(
+                    0, (agent.t - replay_start_size) // update_interval)
+                updated = False
+                # the buffer is not thread-safe; sampling must hold the
+                # same lock as the actor's appends (via act_and_train)
+                with lock:
+                    if len(rbuf) >= max(replay_start_size, minibatch_size) \
+                            and n_updates[0] < wanted:
+                        transitions = rbuf.sample(minibatch_size)
+                        agent.update(transitions)
+                        n_updates[0] += 1
+                        updated = True
+                if not updated:
+                    # wait for the actor to produce more transitions
+                    time.sleep(1e-3)
+        except Exception as e:
+            logger.exception('The learner thread died')
+            learner_exception.append(e)
+
+    learner = threading.Thread(target=learner_loop, name='learner')
+    learner.daemon = True
+    learner.start()
+
+    episode_r = 0
+    episode_len = 0
+    episode_idx = 0
+    obs = env.reset()
+    r = 0
+
+    try:
+        for t in range(steps):
+            if learner_exception:
+                raise RuntimeError(
+                    'The learner thread died') from learner_exception[0]
+            with lock:
+                action = agent.act_and_train(obs, r)
+            obs, r, done, info = env.step(action)
+            episode_r += r
+            episode_len += 1
+            reset = (episode_len == max_episode_len
+                     or info.get('needs_reset', False))
+            if done or reset:
+                with lock:
+                    agent.stop_episode_and_train(obs, r, done=done)
+                logger.info('outdir:%s step:%s episode:%s R:%s',
+                            outdir, t, episode_idx, episode_r)
+                logger.info('statistics:%s updates:%s',
+                            agent.get_statistics(), n_updates[0])
+                episode_r = 0
+                episode_len = 0
+                episode_idx += 1
+                obs = env.reset()
+                r = 0
+    finally:
+        stop_event.set()
+        learner.join()
+        dirname = os.path.join(outdir, '{}_finish'.format(steps))
+        agent.save(dirname)
+        logger.info('Saved the agent to %s', dirname)
@@ -6,6 +6,7 @@ Copyright (c) Preferred Networks, Inc.
 """
 
 import argparse
+import functools
 from logging import getLogger
 import os
 
@@ -16,29 +17,36 @@ import chainer
 
 import chainerrl
 from chainerrl.wrappers import ContinuingTimeLimit, RandomizeAction
-from chainerrl.wrappers.atari_wrappers import FrameStack, ScaledFloatFrame
 
 import sys
 sys.path.append(os.path.abspath(os.path.join(__file__, os.pardir)))
 import utils
-from q_functions import DuelingDQN, DistributionalDuelingDQN
+from q_functions import (
+    DuelingDQN, DistributionalDuelingDQN,
+    StaticDuelingDQN, StaticDistributionalDuelingDQN)
+from replay_buffer import SoAReplayBuffer, Uint8FrameReplayBuffer
+from async_trainer import train_agent_with_learner_thread
+from explorers import FastLinearDecayEpsilonGreedy
 from env_wrappers import (
     SerialDiscreteActionWrapper, CombineActionWrapper, SerialDiscreteCombineActionWrapper,
     ContinuingTimeLimitMonitor,
-    MoveAxisWrapper, FrameSkip, ObtainPoVWrapper, PoVWithCompassAngleWrapper, GrayScaleWrapper)
+    FrameSkip, FusedObsWrapper,
+    CircularFrameStack)
 
 logger = getLogger(__name__)
 
 
-def parse_arch(arch, n_actions, n_input_channels):
+def parse_arch(arch, n_actions, n_input_channels, static=False):
     if arch == 'dueling':
         # Conv2Ds of (channel, kernel, stride): [(32, 8, 4), (64, 4, 2), (64, 3, 1)]
-        return DuelingDQN(n_actions, n_input_channels=n_input_channels, hiddens=[256])
+        cls = StaticDuelingDQN if static else DuelingDQN
+        return cls(n_actions, n_input_channels=n_input_channels, hiddens=[256])
     elif arch == 'distributed_dueling':
         n_atoms = 51
         v_min = -10
         v_max = 10
-        return DistributionalDuelingDQN(n_actions, n_atoms, v_min, v_max, n_input_channels=n_input_channels)
+        cls = StaticDistributionalDuelingDQN if static else DistributionalDuelingDQN
+        return cls(n_actions, n_atoms, v_min, v_max, n_input_channels=n_input_channels)
     else:
         raise RuntimeError('Unsupported architecture name: {}'.format(arch))
 
@@ -94,6 +102,21 @@ def main():
     parser.add_argument('--gray-scale', action='store_true', default=False, help='Convert pov into gray scaled image.')
     parser.add_argument('--monitor', action='store_true', default=False,
                         help='Monitor env. Videos and additional information are saved as output files when evaluation.')
+    parser.add_argument('--mixed16', action='store_true', default=False,
+                        help='Train with float16 activations/weights (fp32 master weights in the optimizer). '
+                        'Halves GPU bandwidth of the conv layers and enables Tensor Cores where available.')
+    parser.add_argument('--async-learner', action='store_true', default=False,
+                        help='Run gradient updates on a background thread so they overlap with env simulation. '
+                        'Periodic evaluation is disabled in this mode.')
+    parser.add_argument('--draw-graph', action='store_true', default=False,
+                        help='Draw the computational graph in the output directory. Adds startup latency.')
+    parser.add_argument('--static-graph', action='store_true', default=False,
+                        help='Trace the Q-network forward pass once per input shape with `chainer.static_graph` '
+                        'and replay the cached schedule, removing per-forward graph construction overhead. '
+                        'Incompatible with --noisy-net-sigma.')
+    parser.add_argument('--num-envs', type=int, default=1,
+                        help='Number of envs stepped in parallel, to amortize the Python wrapper overhead per step. '
+                        'NOTE: MineRL allows only one Minecraft instance per process, so values > 1 are for the debug envs.')
     parser.add_argument('--lr', type=float, default=2.5e-4, help='Learning rate.')
     parser.add_argument('--adam-eps', type=float, default=1e-8, help='Epsilon for Adam.')
     parser.add_argument('--prioritized', action='store_true', default=False, help='Use prioritized experience replay.')
@@ -141,6 +164,18 @@ def _main(args):
     # Set a random seed used in ChainerRL.
     chainerrl.misc.set_random_seed(args.seed)
 
+    if args.mixed16:
+        # fp16 forward/backward; the optimizer keeps fp32 master weights and
+        # scales the loss (see `opt.loss_scaling()` below).
+        chainer.global_config.dtype = chainer.mixed16
+
+    if args.gpu >= 0:
+        # The Q-network sees fixed batch shapes every update, so let cuDNN
+        # benchmark once and cache the fastest conv algorithms instead of
+        # re-deriving them from heuristics on each call.
+        chainer.global_config.autotune = True
+        chainer.global_config.use_cudnn = 'always'
+
     # Set different random seeds for train and test envs.
     train_seed = args.seed  # noqa: never used in this script
     test_seed = 2 ** 31 - 1 - args.seed
@@ -162,16 +197,17 @@ def _main(args):
                 mode='evaluation' if test else 'training', video_callable=lambda episode_id: True)
         if args.frame_skip is not None:
             env = FrameSkip(env, skip=args.frame_skip)
-        if args.gray_scale:
-            env = GrayScaleWrapper(env, dict_space_key='pov')
-        if args.env.startswith('MineRLNavigate'):
-            env = PoVWithCompassAngleWrapper(env)
-        else:
-            env = ObtainPoVWrapper(env)
-        env = MoveAxisWrapper(env, source=-1, destination=0)  # convert hwc -> chw as Chainer requires.
-        env = ScaledFloatFrame(env)
+        # one fused pass over the frame: pov extraction, (optional)
+        # gray-scaling, (for Navigate) the compass-angle channel, and
+        # hwc -> chw conversion as Chainer requires.
+        env = FusedObsWrapper(
+            env, gray_scale=args.gray_scale,
+            compass=args.env.startswith('MineRLNavigate'))
+        # NOTE: pixels are kept as uint8 up to (and inside) the replay buffer;
+        # `phi` scales them to [0, 1] float32 just before the Q-network.
+        # This quarters replay buffer RAM compared with `ScaledFloatFrame`.
         if args.frame_stack is not None and args.frame_stack > 0:
-            env = FrameStack(env, args.frame_stack, channel_order='chw')
+            env = CircularFrameStack(env, args.frame_stack)
 
         # wrap env: action...
         if not args.disable_action_prior:
@@ -189,35 +225,62 @@ def _main(args):
         # env.seed(int(env_seed))  # TODO: not supported yet
         return env
 
-    core_env = gym.make(args.env)
-    env = wrap_env(core_env, test=False)
-    # eval_env = gym.make(args.env)  # Can't create multiple MineRL envs
-    # eval_env = wrap_env(eval_env, test=True)
-    eval_env = wrap_env(core_env, test=True)
+    def make_env(test):
+        return wrap_env(gym.make(args.env), test)
+
+    if args.num_envs > 1:
+        # Step several envs in parallel so the Python wrapper round-trip per
+        # step is amortized across the batch and the learner sees one batch
+        # per step. Only usable with envs that allow multiple instances.
+        env = chainerrl.envs.MultiprocessVectorEnv(
+            [functools.partial(make_env, False) for _ in range(args.num_envs)])
+        eval_env = chainerrl.envs.MultiprocessVectorEnv(
+            [functools.partial(make_env, True) for _ in range(args.num_envs)])
+    else:
+        core_env = gym.make(args.env)
+        env = wrap_env(core_env, test=False)
+        # eval_env = gym.make(args.env)  # Can't create multiple MineRL envs
+        # eval_env = wrap_env(eval_env, test=True)
+        eval_env = wrap_env(core_env, test=True)
 
     # Q function
     n_actions = env.action_space.n
-    q_func = parse_arch(args.arch, n_actions, n_input_channels=env.observation_space.shape[0])
+    q_func = parse_arch(args.arch, n_actions, n_input_channels=env.observation_space.shape[0],
+                        static=args.static_graph)
 
     # explorer
     if args.noisy_net_sigma is not None:
+        assert not args.static_graph, \
+            '--static-graph would freeze the sampled noise of noisy nets.'
         chainerrl.links.to_factorized_noisy(q_func, sigma_scale=args.noisy_net_sigma)
         # Turn off explorer
         explorer = chainerrl.explorers.Greedy()
     else:
-        explorer = chainerrl.explorers.LinearDecayEpsilonGreedy(
+        explorer = FastLinearDecayEpsilonGreedy(
             1.0, args.final_epsilon, args.final_exploration_frames, env.action_space.sample)
 
-    # Draw the computational graph and save it in the output directory.
-    sample_obs = env.observation_space.sample()
-    sample_batch_obs = np.expand_dims(sample_obs, 0)
-    chainerrl.misc.draw_computational_graph([q_func(sample_batch_obs)], os.path.join(args.outdir, 'model'))
+    in_dtype = chainer.get_dtype()  # float16 under --mixed16
+
+    if args.draw_graph:
+        # Draw the computational graph and save it in the output directory.
+        # A zero tensor stands in for `observation_space.sample()`, which is
+        # very slow for MineRL's nested dict spaces.
+        sample_batch_obs = np.zeros(
+            (1,) + env.observation_space.shape, dtype=in_dtype)
+        chainerrl.misc.draw_computational_graph([q_func(sample_batch_obs)], os.path.join(args.outdir, 'model'))
 
     # Use the Nature paper's hyperparameters
     # opt = optimizers.RMSpropGraves(lr=args.lr, alpha=0.95, momentum=0.0, eps=1e-2)
+    # NOTE: on GPU, Chainer's Adam already fuses the moment and parameter
+    # updates into a single elementwise kernel per parameter; fusing across
+    # parameters would require a persistent flat buffer, which Chainer's
+    # per-backward grad reallocation does not allow.
     opt = chainer.optimizers.Adam(alpha=args.lr, eps=args.adam_eps)  # NOTE: mirrors DQN implementation in MineRL paper
 
     opt.setup(q_func)
+    if args.mixed16:
+        # loss scaling keeps small fp16 gradients from flushing to zero
+        opt.loss_scaling()
 
     # calculate corresponding `steps` and `eval_interval` according to frameskip
     # = 1440 episodes if we count an episode as 6000 frames,
@@ -236,18 +299,91 @@ def _main(args):
         betasteps = steps / args.update_interval
         rbuf = chainerrl.replay_buffer.PrioritizedReplayBuffer(
             args.replay_capacity, alpha=0.5, beta0=0.4, betasteps=betasteps, num_steps=args.num_step_return)
+    elif args.num_envs == 1 and args.num_step_return == 1 and env.observation_space.dtype == np.uint8:
+        # (frame ordering in the ring assumes a single env)
+        # Store each uint8 frame once (SoA ring buffer) and rebuild frame
+        # stacks on sampling, instead of keeping one dict per transition with
+        # duplicated stacked frames.
+        n_stack = args.frame_stack if args.frame_stack is not None and args.frame_stack > 0 else 1
+        obs_shape = env.observation_space.shape
+        frame_shape = (obs_shape[0] // n_stack,) + obs_shape[1:]
+        rbuf = Uint8FrameReplayBuffer(args.replay_capacity, frame_shape, stack=n_stack)
+    elif args.num_envs == 1:
+        # struct-of-arrays storage; same n-step semantics as ReplayBuffer
+        rbuf = SoAReplayBuffer(args.replay_capacity, num_steps=args.num_step_return)
     else:
         rbuf = chainerrl.replay_buffer.ReplayBuffer(args.replay_capacity, args.num_step_return)
 
     # build agent
-    def phi(x):
-        # observation -> NN input
-        return np.asarray(x)
+    batch_states = None
+    if args.gpu >= 0:
+        import cupy
+
+        # Fused uint8 -> float scaling: one kernel does load, convert and
+        # scale in a single pass instead of a cast kernel plus a multiply.
+        out_ctype = 'float16' if args.mixed16 else 'float32'
+        scale_pix = cupy.ElementwiseKernel(
+            'uint8 x', '{} y'.format(out_ctype),
+            'y = x * (1.0f / 255.0f)', 'scale_pix')
+
+        if args.mixed16:
+            def phi(x):
+                # observation (uint8) -> NN input (float16, [0, 1])
+                return cupy.asarray(np.asarray(x), dtype=cupy.float16) * cupy.float16(1 / 255)
+        else:
+            def phi(x):
+                # observation (uint8) -> NN input (float32, [0, 1])
+                x = np.asarray(x)
+                if x.dtype == np.uint8:
+                    return scale_pix(cupy.asarray(x))
+                return cupy.asarray(x, dtype=cupy.float32) * cupy.float32(1 / 255)
+
+        # The default `batch_states` applies `phi` per sample, which means
+        # one small host-to-device copy per transition. Instead, stack the
+        # whole batch into a cached pinned-host buffer, upload it with a
+        # single `.set()`, and convert/scale once on the GPU.
+        _staging = {}
+
+        def _stack_to_gpu(states):
+            arr0 = np.asarray(states[0])
+            shape = (len(states),) + arr0.shape
+            key = (shape, arr0.dtype.str)
+            bufs = _staging.get(key)
+            if bufs is None:
+                n_items = int(np.prod(shape))
+                mem = cupy.cuda.alloc_pinned_memory(
+                    n_items * arr0.dtype.itemsize)
+                host = np.frombuffer(
+                    mem, arr0.dtype, n_items).reshape(shape)
+                bufs = (host, cupy.empty(shape, arr0.dtype))
+                _staging[key] = bufs
+            host, dev = bufs
+            for i, s in enumerate(states):
+                host[i] = s
+            dev.set(host)
+            return dev
+
+        def batch_states(states, xp, phi):
+            dev = _stack_to_gpu(states)
+            if dev.dtype == cupy.uint8:
+                return scale_pix(dev)
+            out_dtype = cupy.float16 if args.mixed16 else cupy.float32
+            return dev.astype(out_dtype) * out_dtype(1 / 255)
+    else:
+        def phi(x):
+            # observation (uint8) -> NN input (float, [0, 1])
+            return np.multiply(np.asarray(x), in_dtype.type(1 / 255))
     Agent = parse_agent(args.agent)
+    # With --async-learner the updates are paced by the learner thread, so
+    # the agent's own in-loop replay updater is effectively disabled.
+    agent_update_interval = steps + 1 if args.async_learner else args.update_interval
+    agent_kwargs = {}
+    if batch_states is not None:
+        agent_kwargs['batch_states'] = batch_states
     agent = Agent(
         q_func, opt, rbuf, gpu=args.gpu, gamma=args.gamma, explorer=explorer, replay_start_size=args.replay_start_size,
-        target_update_interval=args.target_update_interval, clip_delta=args.clip_delta, update_interval=args.update_interval,
-        batch_accumulator=args.batch_accumulator, phi=phi)
+        target_update_interval=args.target_update_interval, clip_delta=args.clip_delta, update_interval=agent_update_interval,
+        batch_accumulator=args.batch_accumulator, phi=phi, **agent_kwargs)
     if args.load:
         agent.load(args.load)
 
@@ -256,6 +392,19 @@ def _main(args):
         eval_stats = chainerrl.experiments.eval_performance(env=eval_env, agent=agent, n_steps=None, n_episodes=args.eval_n_runs)
         logger.info('n_runs: {} mean: {} median: {} stdev {}'.format(
             args.eval_n_runs, eval_stats['mean'], eval_stats['median'], eval_stats['stdev']))
+    elif args.async_learner:
+        assert args.num_envs == 1, '--async-learner supports a single env only.'
+        train_agent_with_learner_thread(
+            agent, env, steps, args.outdir,
+            update_interval=args.update_interval,
+            replay_start_size=args.replay_start_size,
+            minibatch_size=agent.replay_updater.batchsize)
+    elif args.num_envs > 1:
+        chainerrl.experiments.train_agent_batch_with_evaluation(
+            agent=agent, env=env, steps=steps,
+            eval_n_steps=None, eval_n_episodes=args.eval_n_runs, eval_interval=eval_interval,
+            outdir=args.outdir, eval_env=eval_env, save_best_so_far_agent=True,
+        )
     else:
         chainerrl.experiments.train_agent_with_evaluation(
             agent=agent, env=env, steps=steps,
@@ -17,7 +17,7 @@ import chainer
 
 import chainerrl
 from chainerrl.wrappers import ContinuingTimeLimit
-from chainerrl.wrappers.atari_wrappers import FrameStack, ScaledFloatFrame
+from chainerrl.wrappers.atari_wrappers import ScaledFloatFrame
 
 import sys
 sys.path.append(os.path.abspath(os.path.join(__file__, os.pardir)))
@@ -26,7 +26,8 @@ from q_functions import NatureDQNHead, A3CFF
 from env_wrappers import (
     SerialDiscreteActionWrapper, CombineActionWrapper, SerialDiscreteCombineActionWrapper,
     ContinuingTimeLimitMonitor,
-    MoveAxisWrapper, FrameSkip, ObtainPoVWrapper, PoVWithCompassAngleWrapper, GrayScaleWrapper)
+    MoveAxisWrapper, FrameSkip, ObtainPoVWrapper, PoVWithCompassAngleWrapper, GrayScaleWrapper,
+    CircularFrameStack)
 
 logger = getLogger(__name__)
 
@@ -147,7 +148,7 @@ def _main(args):
         env = MoveAxisWrapper(env, source=-1, destination=0)  # convert hwc -> chw as Chainer requires.
         env = ScaledFloatFrame(env)
         if args.frame_stack is not None and args.frame_stack > 0:
-            env = FrameStack(env, args.frame_stack, channel_order='chw')
+            env = CircularFrameStack(env, args.frame_stack)
 
         # wrap env: action...
         if not args.disable_action_prior:
@@ -71,7 +71,7 @@ class DuelingDQN(chainer.Chain, chainerrl.q_function.StateQFunction):
             self.a_stream = chainerrl.links.mlp.MLP(None, n_actions, self.hiddens)
             self.v_stream = chainerrl.links.mlp.MLP(None, 1, self.hiddens)
 
-    def __call__(self, x):
+    def compute_q(self, x):
         h = x
         for l in self.conv_layers:
             h = self.activation(l(h))
@@ -87,8 +87,22 @@ class DuelingDQN(chainer.Chain, chainerrl.q_function.StateQFunction):
         ys = self.v_stream(h)
 
         ya, ys = F.broadcast(ya, ys)
-        q = ya + ys
-        return chainerrl.action_value.DiscreteActionValue(q)
+        return ya + ys
+
+    def __call__(self, x):
+        return chainerrl.action_value.DiscreteActionValue(self.compute_q(x))
+
+
+class StaticDuelingDQN(DuelingDQN):
+    """`DuelingDQN` with its forward pass run as a Chainer static subgraph.
+
+    `chainer.static_graph` traces the define-by-run graph once per input
+    shape and replays the cached schedule afterwards, removing the
+    per-forward Python graph-construction overhead of the conv stack and
+    the dueling streams.
+    """
+
+    compute_q = chainer.static_graph(DuelingDQN.compute_q)
 
 
 class DistributionalDuelingDQN(
@@ -123,7 +137,7 @@ class DistributionalDuelingDQN(
             self.a_stream = L.Linear(512, n_actions * n_atoms)
             self.v_stream = L.Linear(512, n_atoms)
 
-    def __call__(self, x):
+    def compute_probs(self, x):
         h = x
         for l in self.conv_layers:
             h = self.activation(l(h))
@@ -143,6 +157,17 @@ class DistributionalDuelingDQN(
         # State value
         ys = F.reshape(self.v_stream(h_v), (batch_size, 1, self.n_atoms))
         ya, ys = F.broadcast(ya, ys)
-        q = F.softmax(ya + ys, axis=2)
+        return F.softmax(ya + ys, axis=2)
+
+    def __call__(self, x):
+        return chainerrl.action_value.DistributionalDiscreteActionValue(
+            self.compute_probs(x), self.z_values)
+
+
+class StaticDistributionalDuelingDQN(DistributionalDuelingDQN):
+    """`DistributionalDuelingDQN` run as a Chainer static subgraph.
+
+    See `StaticDuelingDQN`.
+    """
 
-        return chainerrl.action_value.DistributionalDiscreteActionValue(q, self.z_values)
+    compute_probs = chainer.static_graph(DistributionalDuelingDQN.compute_probs)
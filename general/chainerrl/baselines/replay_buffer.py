@@ -0,0 +1,411 @@
+from logging import getLogger
+
+import numpy as np
+
+from chainerrl import replay_buffer
+from chainerrl.misc.random import sample_n_k
+
+logger = getLogger(__name__)
+
+
+class SoAReplayBuffer(replay_buffer.AbstractReplayBuffer):
+    """Struct-of-arrays ring replay buffer with n-step support.
+
+    Drop-in for `chainerrl.replay_buffer.ReplayBuffer` in single-env
+    training. The generic buffer keeps one Python dict per transition
+    (plus a list per n-step group) inside a `RandomAccessQueue`; at
+    million-transition capacities that is gigabytes of object overhead
+    and pointer chasing on every sample. Here each field lives in one
+    preallocated NumPy array indexed ring-buffer style, transitions are
+    stored once, and the n-step groups exist only as a per-start window
+    length, materialized lazily at sampling time.
+
+    Args:
+        capacity (int): capacity in terms of number of transitions
+        num_steps (int): Number of timesteps per stored experience
+        state_dtype: If given, store states/next_states with this dtype
+            regardless of what `append` receives. Passing `np.uint8` for
+            [0, 255]-valued image observations that an upstream wrapper
+            converted to float quarters buffer RAM; the trainer's `phi`
+            must then rescale (`x.astype(np.float32) / 255`) before the
+            network, as `dqn_family` already does.
+    """
+
+    def __init__(self, capacity, num_steps=1, state_dtype=None):
+        assert capacity > 0
+        assert num_steps > 0
+        self.capacity = capacity
+        self.num_steps = num_steps
+        self.state_dtype = state_dtype
+        # field arrays are allocated on the first append, when the
+        # observation/action shapes and dtypes are known
+        self.states = None
+        self.next_states = None
+        self.actions = None
+        self.rewards = np.empty(capacity, dtype=np.float32)
+        self.is_terminals = np.empty(capacity, dtype=np.bool_)
+        # n-step window length of the group starting at each slot
+        # (0 while the window is still open)
+        self.lens = np.zeros(capacity, dtype=np.int16)
+        # Monotonically increasing number of appended transitions
+        self._t = 0
+        # number of newest transitions whose windows are still open
+        self._n_pending = 0
+
+    def _allocate(self, state, action):
+        state = np.asarray(state)
+        action = np.asarray(action)
+        # ndarray assignment in `append` casts into this dtype for free
+        self.states = np.empty(
+            (self.capacity,) + state.shape,
+            dtype=self.state_dtype or state.dtype)
+        self.next_states = np.empty_like(self.states)
+        self.actions = np.empty(
+            (self.capacity,) + action.shape, dtype=action.dtype)
+
+    def append(self, state, action, reward, next_state=None, next_action=None,
+               is_state_terminal=False, env_id=0, **kwargs):
+        assert env_id == 0, \
+            'SoAReplayBuffer tracks a single episode; use the generic ' \
+            'ReplayBuffer for multi-env training.'
+        if self.states is None:
+            self._allocate(state, action)
+        pos = self._t % self.capacity
+        self.states[pos] = state
+        self.next_states[pos] = next_state
+        self.actions[pos] = action
+        self.rewards[pos] = reward
+        self.is_terminals[pos] = is_state_terminal
+        self.lens[pos] = 0
+        self._t += 1
+        self._n_pending += 1
+        if self._n_pending == self.num_steps:
+            # the window starting num_steps transitions back is complete
+            start = self._t - self.num_steps
+            self.lens[start % self.capacity] = self.num_steps
+            self._n_pending -= 1
+        if is_state_terminal:
+            self._close_open_windows()
+
+    def _close_open_windows(self):
+        # the remaining open windows end at the episode's last transition
+        last = self._t - 1
+        while self._n_pending > 0:
+            start = self._t - self._n_pending
+            self.lens[start % self.capacity] = last - start + 1
+            self._n_pending -= 1
+
+    def stop_current_episode(self, env_id=0):
+        self._close_open_windows()
+
+    def sample(self, num_experiences):
+        size = min(self._t, self.capacity)
+        n_valid = size - self._n_pending
+        assert n_valid >= num_experiences
+        lo = self._t - size
+        starts = lo + sample_n_k(n_valid, num_experiences)
+
+        sampled = []
+        for a in starts:
+            length = int(self.lens[a % self.capacity])
+            pos = np.arange(a, a + length) % self.capacity
+            # fancy indexing copies, so the emitted transitions do not
+            # alias the ring
+            states = self.states[pos]
+            next_states = self.next_states[pos]
+            actions = self.actions[pos]
+            rewards = self.rewards[pos]
+            is_terminals = self.is_terminals[pos]
+            sampled.append([dict(
+                state=states[i],
+                action=actions[i] if actions[i].ndim else actions[i].item(),
+                reward=float(rewards[i]),
+                next_state=next_states[i],
+                next_action=None,
+                is_state_terminal=bool(is_terminals[i]),
+            ) for i in range(length)])
+        return sampled
+
+    def sample_batched(self, num_experiences, gamma):
+        """Sample experiences as a dict of stacked arrays.
+
+        Equivalent to running ``chainerrl.replay_buffer.batch_experiences``
+        on the output of ``sample()``, but built with whole-array gathers
+        straight from the field arrays instead of materializing and
+        re-stacking per-transition dicts. The returned dict holds numpy
+        arrays keyed ``state``, ``action``, ``reward``, ``next_state``,
+        ``is_state_terminal`` and ``discount``.
+        """
+        size = min(self._t, self.capacity)
+        n_valid = size - self._n_pending
+        assert n_valid >= num_experiences
+        lo = self._t - size
+        starts = lo + sample_n_k(n_valid, num_experiences)
+        pos = starts % self.capacity
+        lens = self.lens[pos].astype(np.int64)
+
+        gamma = np.float32(gamma)
+        if self.num_steps == 1:
+            rewards = self.rewards[pos]
+            last_pos = pos
+            is_terminals = self.is_terminals[pos]
+        else:
+            max_len = int(lens.max())
+            window = (starts[:, None]
+                      + np.arange(max_len)[None]) % self.capacity
+            in_window = np.arange(max_len)[None] < lens[:, None]
+            rewards = np.where(in_window, self.rewards[window], 0.0).dot(
+                gamma ** np.arange(max_len, dtype=np.float32))
+            last_pos = (starts + lens - 1) % self.capacity
+            is_terminals = (self.is_terminals[window] & in_window).any(axis=1)
+        return {
+            'state': self.states[pos],
+            'action': self.actions[pos],
+            'reward': rewards.astype(np.float32),
+            'next_state': self.next_states[last_pos],
+            'is_state_terminal': is_terminals.astype(np.float32),
+            'discount': gamma ** lens.astype(np.float32),
+        }
+
+    def __len__(self):
+        return min(self._t, self.capacity) - self._n_pending
+
+    def save(self, filename):
+        size = min(self._t, self.capacity)
+        with open(filename, 'wb') as f:
+            np.savez(
+                f,
+                states=self.states[:size],
+                next_states=self.next_states[:size],
+                actions=self.actions[:size],
+                rewards=self.rewards[:size],
+                is_terminals=self.is_terminals[:size],
+                lens=self.lens[:size],
+                t=self._t,
+                n_pending=self._n_pending,
+            )
+
+    def load(self, filename):
+        with np.load(filename) as data:
+            size = len(data['states'])
+            assert size <= self.capacity
+            if self.states is None:
+                self._allocate(data['states'][0], data['actions'][0])
+            self.states[:size] = data['states']
+            self.next_states[:size] = data['next_states']
+            self.actions[:size] = data['actions']
+            self.rewards[:size] = data['rewards']
+            self.is_terminals[:size] = data['is_terminals']
+            self.lens[:size] = data['lens']
+            self._t = int(data['t'])
+            self._n_pending = int(data['n_pending'])
+
+
+class Uint8FrameReplayBuffer(replay_buffer.AbstractReplayBuffer):
+    """Replay buffer specialized for (stacked) uint8 image observations.
+
+    Stores each frame exactly once in a preallocated contiguous uint8 ring
+    buffer (struct-of-arrays) and rebuilds the frame stacks with fancy
+    indexing at sampling time. Compared with the generic dict-per-transition
+    buffer holding float32 stacks, this cuts replay RAM by ~4x (uint8 vs
+    float32) times the stack size (no duplicated frames across stacked
+    observations).
+
+    Stacks are never reconstructed across an episode boundary; the first
+    frame of an episode is repeated instead, mirroring what a frame-stack
+    wrapper produces right after ``reset()``.
+
+    When an episode ends without a terminal state (e.g. a timeout via
+    ``ContinuingTimeLimit``), its final observation is still needed as the
+    ``next_state`` of the last transition, but no later ``append`` stores
+    it. ``stop_current_episode`` therefore writes that frame into a
+    frame-only ring slot, marked invalid for sampling, so the successor
+    lookup never crosses into the next episode.
+
+    Args:
+        capacity (int): capacity in terms of number of transitions
+        frame_shape (tuple of int): shape of a single (unstacked) CHW frame
+        stack (int): number of frames per observation
+    """
+
+    def __init__(self, capacity, frame_shape, stack=1):
+        assert capacity > 1
+        assert stack > 0
+        self.capacity = capacity
+        self.frame_shape = tuple(frame_shape)
+        self.stack = stack
+        self.frames = np.empty((capacity,) + self.frame_shape, dtype=np.uint8)
+        self.actions = np.empty(capacity, dtype=np.int32)
+        self.rewards = np.empty(capacity, dtype=np.float32)
+        self.is_terminals = np.empty(capacity, dtype=np.bool_)
+        # True where the stored frame is the first one of its episode
+        self.episode_starts = np.empty(capacity, dtype=np.bool_)
+        # True where the slot holds a transition; False for slots that
+        # only hold the final frame of a timeout-ended episode
+        self.valid = np.empty(capacity, dtype=np.bool_)
+        # Monotonically increasing number of written slots
+        self._t = 0
+        self._new_episode = True
+        # newest frame of the last transition's next_state, kept until
+        # the episode boundary (or the next transition) is known
+        self._pending_final_frame = None
+        # number of frame-only slots alive in the ring
+        self._n_frame_slots = 0
+
+    def _newest_frame(self, state):
+        # With frame stacking, `state` holds `stack * C` channels; only the
+        # newest C channels are a frame we have not stored yet.
+        state = np.asarray(state)
+        return state[-self.frame_shape[0]:]
+
+    def _evict(self, pos):
+        # the slot about to be overwritten may be a frame-only slot
+        if self._t >= self.capacity and not self.valid[pos]:
+            self._n_frame_slots -= 1
+
+    def append(self, state, action, reward, next_state=None, next_action=None,
+               is_state_terminal=False, env_id=0, **kwargs):
+        pos = self._t % self.capacity
+        self._evict(pos)
+        self.frames[pos] = self._newest_frame(state)
+        self.actions[pos] = action
+        self.rewards[pos] = reward
+        self.is_terminals[pos] = is_state_terminal
+        self.episode_starts[pos] = self._new_episode
+        self.valid[pos] = True
+        self._new_episode = bool(is_state_terminal)
+        if is_state_terminal or next_state is None:
+            self._pending_final_frame = None
+        else:
+            # copied because callers may reuse the observation buffer
+            self._pending_final_frame = \
+                np.array(self._newest_frame(next_state))
+        self._t += 1
+
+    def stop_current_episode(self, env_id=0):
+        if self._pending_final_frame is not None:
+            # Without this slot, sampling the episode's last transition
+            # would rebuild its next_state from the following episode's
+            # first frame while is_state_terminal stays False.
+            pos = self._t % self.capacity
+            self._evict(pos)
+            self.frames[pos] = self._pending_final_frame
+            self.episode_starts[pos] = False
+            self.valid[pos] = False
+            self._n_frame_slots += 1
+            self._pending_final_frame = None
+            self._t += 1
+        self._new_episode = True
+
+    def _stack_indices(self, abs_idx, lo):
+        """Build (n, stack) ring indices, oldest to newest, for given bases.
+
+        Walking backwards stops at episode starts and at the oldest frame
+        still alive in the ring, repeating the boundary frame instead.
+        """
+        cur = abs_idx
+        cols = [cur % self.capacity]
+        for _ in range(self.stack - 1):
+            prev = cur - 1
+            valid = (prev >= lo) & ~self.episode_starts[cur % self.capacity]
+            cur = np.where(valid, prev, cur)
+            cols.append(cur % self.capacity)
+        cols.reverse()
+        return np.stack(cols, axis=1)
+
+    def _gather(self, num_experiences):
+        size = min(self._t, self.capacity)
+        # The newest slot is excluded: if it holds a transition, its
+        # successor frame (needed for next_state) is not stored yet.
+        n_sampleable = size - self._n_frame_slots \
+            - bool(size and self.valid[(self._t - 1) % self.capacity])
+        assert n_sampleable >= num_experiences
+        lo = self._t - size
+        abs_idx = lo + sample_n_k(size - 1, num_experiences)
+        # redraw any frame-only slots; they are rare (one per episode)
+        bad = ~self.valid[abs_idx % self.capacity]
+        if bad.any():
+            chosen = set(abs_idx[~bad].tolist())
+            for j in np.flatnonzero(bad):
+                while True:
+                    cand = lo + np.random.randint(size - 1)
+                    if self.valid[cand % self.capacity] \
+                            and cand not in chosen:
+                        break
+                chosen.add(cand)
+                abs_idx[j] = cand
+
+        n = num_experiences
+        c, h, w = self.frame_shape
+        state_idx = self._stack_indices(abs_idx, lo)
+        next_state_idx = self._stack_indices(abs_idx + 1, lo)
+        states = self.frames[state_idx].reshape(n, self.stack * c, h, w)
+        next_states = self.frames[next_state_idx].reshape(
+            n, self.stack * c, h, w)
+
+        pos = abs_idx % self.capacity
+        return (states, self.actions[pos], self.rewards[pos],
+                next_states, self.is_terminals[pos])
+
+    def sample(self, num_experiences):
+        n = num_experiences
+        states, actions, rewards, next_states, is_terminals = \
+            self._gather(n)
+        return [[dict(
+            state=states[i],
+            action=int(actions[i]),
+            reward=float(rewards[i]),
+            next_state=next_states[i],
+            next_action=None,
+            is_state_terminal=bool(is_terminals[i]),
+        )] for i in range(n)]
+
+    def sample_batched(self, num_experiences, gamma):
+        """Sample experiences as a dict of stacked arrays.
+
+        See ``SoAReplayBuffer.sample_batched``; this buffer stores 1-step
+        transitions only, so the gather is direct.
+        """
+        states, actions, rewards, next_states, is_terminals = \
+            self._gather(num_experiences)
+        return {
+            'state': states,
+            'action': actions,
+            'reward': rewards,
+            'next_state': next_states,
+            'is_state_terminal': is_terminals.astype(np.float32),
+            'discount': np.full(
+                num_experiences, gamma, dtype=np.float32),
+        }
+
+    def __len__(self):
+        return min(self._t, self.capacity) - self._n_frame_slots
+
+    def save(self, filename):
+        size = min(self._t, self.capacity)
+        with open(filename, 'wb') as f:
+            np.savez(
+                f,
+                frames=self.frames[:size],
+                actions=self.actions[:size],
+                rewards=self.rewards[:size],
+                is_terminals=self.is_terminals[:size],
+                episode_starts=self.episode_starts[:size],
+                valid=self.valid[:size],
+                t=self._t,
+            )
+
+    def load(self, filename):
+        with np.load(filename) as data:
+            size = len(data['frames'])
+            assert size <= self.capacity
+            self.frames[:size] = data['frames']
+            self.actions[:size] = data['actions']
+            self.rewards[:size] = data['rewards']
+            self.is_terminals[:size] = data['is_terminals']
+            self.episode_starts[:size] = data['episode_starts']
+            self.valid[:size] = data['valid']
+            self._n_frame_slots = int(size - self.valid[:size].sum())
+            self._t = int(data['t'])
+        self._new_episode = True
+        self._pending_final_frame = None
@@ -0,0 +1,287 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from replay_buffer import SoAReplayBuffer
+from replay_buffer import Uint8FrameReplayBuffer
+
+
+def make_frame(value, frame_shape=(1, 2, 2)):
+    return np.full(frame_shape, value, dtype=np.uint8)
+
+
+def stacked(values, stack, frame_shape=(1, 2, 2)):
+    """Frame stack an episode prefix the way a frame-stack wrapper would.
+
+    `values` are the frame values of the episode so far, newest last; the
+    first frame is repeated when fewer than `stack` frames exist yet.
+    """
+    window = list(values[-stack:])
+    while len(window) < stack:
+        window.insert(0, window[0])
+    return np.concatenate([make_frame(v, frame_shape) for v in window],
+                          axis=0)
+
+
+class TestSoAReplayBuffer(unittest.TestCase):
+    """Covers the n-step window bookkeeping of SoAReplayBuffer."""
+
+    def feed_episode(self, buf, ids, terminal, num_steps):
+        """Append one episode whose transitions carry the global `ids`.
+
+        Returns (windows, terminal_ids): the expected n-step window (a
+        list of ids) starting at each id, and the set of ids appended
+        with is_state_terminal=True.
+        """
+        k = len(ids)
+        for j, i in enumerate(ids):
+            buf.append(
+                state=np.full(2, i, dtype=np.float32),
+                action=i,
+                reward=float(i),
+                next_state=np.full(2, i + 1, dtype=np.float32),
+                is_state_terminal=terminal and j == k - 1,
+            )
+        buf.stop_current_episode()
+        windows = {i: [ids[j + m] for m in range(min(num_steps, k - j))]
+                   for j, i in enumerate(ids)}
+        terminal_ids = {ids[-1]} if terminal else set()
+        return windows, terminal_ids
+
+    def check_all_windows(self, buf, windows, terminal_ids):
+        """Sample every valid window and compare against the expectation."""
+        sampled = buf.sample(len(buf))
+        seen_starts = set()
+        for group in sampled:
+            start = group[0]['action']
+            seen_starts.add(start)
+            expected_ids = windows[start]
+            self.assertEqual(len(group), len(expected_ids))
+            for transition, i in zip(group, expected_ids):
+                self.assertEqual(transition['action'], i)
+                self.assertEqual(transition['reward'], float(i))
+                np.testing.assert_array_equal(
+                    transition['state'],
+                    np.full(2, i, dtype=transition['state'].dtype))
+                np.testing.assert_array_equal(
+                    transition['next_state'],
+                    np.full(2, i + 1, dtype=transition['next_state'].dtype))
+                self.assertEqual(
+                    transition['is_state_terminal'], i in terminal_ids)
+        self.assertEqual(len(seen_starts), len(buf))
+
+    def test_windows_terminal_episode(self):
+        buf = SoAReplayBuffer(capacity=100, num_steps=3)
+        windows, terminal_ids = self.feed_episode(
+            buf, ids=[0, 1, 2, 3, 4], terminal=True, num_steps=3)
+        # all five windows close at the terminal transition
+        self.assertEqual(len(buf), 5)
+        self.check_all_windows(buf, windows, terminal_ids)
+
+    def test_windows_timeout_episode(self):
+        buf = SoAReplayBuffer(capacity=100, num_steps=3)
+        ids = [0, 1, 2, 3, 4]
+        k = len(ids)
+        for j, i in enumerate(ids):
+            buf.append(
+                state=np.full(2, i, dtype=np.float32),
+                action=i,
+                reward=float(i),
+                next_state=np.full(2, i + 1, dtype=np.float32),
+                is_state_terminal=False,
+            )
+            # while the episode is open, the newest num_steps - 1
+            # windows are still pending and must not be sampleable
+            self.assertEqual(len(buf), max(0, j + 1 - 2))
+        buf.stop_current_episode()
+        self.assertEqual(len(buf), k)
+        windows = {i: [ids[j + m] for m in range(min(3, k - j))]
+                   for j, i in enumerate(ids)}
+        self.check_all_windows(buf, windows, set())
+
+    def test_ring_wrap(self):
+        buf = SoAReplayBuffer(capacity=8, num_steps=2)
+        windows = {}
+        terminal_ids = set()
+        next_id = 0
+        for episode in range(10):
+            ids = list(range(next_id, next_id + 2 + episode % 3))
+            next_id = ids[-1] + 1
+            w, t = self.feed_episode(
+                buf, ids=ids, terminal=episode % 2 == 0, num_steps=2)
+            windows.update(w)
+            terminal_ids.update(t)
+            self.assertLessEqual(len(buf), buf.capacity)
+            self.check_all_windows(buf, windows, terminal_ids)
+
+    def test_sample_batched(self):
+        gamma = 0.9
+        buf = SoAReplayBuffer(capacity=100, num_steps=3)
+        windows, terminal_ids = self.feed_episode(
+            buf, ids=[0, 1, 2, 3, 4], terminal=True, num_steps=3)
+        w2, t2 = self.feed_episode(
+            buf, ids=[10, 11, 12], terminal=False, num_steps=3)
+        windows.update(w2)
+        terminal_ids.update(t2)
+        batch = buf.sample_batched(len(buf), gamma)
+        self.assertEqual(len(batch['state']), len(buf))
+        for row in range(len(buf)):
+            start = int(batch['action'][row])
+            expected_ids = windows[start]
+            np.testing.assert_array_equal(
+                batch['state'][row], np.full(2, start, dtype=np.float32))
+            np.testing.assert_array_equal(
+                batch['next_state'][row],
+                np.full(2, expected_ids[-1] + 1, dtype=np.float32))
+            expected_reward = sum(
+                gamma ** m * i for m, i in enumerate(expected_ids))
+            self.assertAlmostEqual(
+                float(batch['reward'][row]), expected_reward, places=4)
+            self.assertAlmostEqual(
+                float(batch['discount'][row]),
+                gamma ** len(expected_ids), places=5)
+            self.assertEqual(
+                bool(batch['is_state_terminal'][row]),
+                bool(terminal_ids & set(expected_ids)))
+
+    def test_state_dtype(self):
+        buf = SoAReplayBuffer(capacity=10, num_steps=1,
+                              state_dtype=np.uint8)
+        windows, terminal_ids = self.feed_episode(
+            buf, ids=[3, 4, 5], terminal=True, num_steps=1)
+        self.assertEqual(buf.states.dtype, np.uint8)
+        self.assertEqual(buf.next_states.dtype, np.uint8)
+        for (transition,) in buf.sample(len(buf)):
+            self.assertEqual(transition['state'].dtype, np.uint8)
+        self.check_all_windows(buf, windows, terminal_ids)
+
+    def test_save_load(self):
+        buf = SoAReplayBuffer(capacity=50, num_steps=2)
+        windows, terminal_ids = self.feed_episode(
+            buf, ids=[0, 1, 2, 3], terminal=False, num_steps=2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'rbuf.npz')
+            buf.save(filename)
+            loaded = SoAReplayBuffer(capacity=50, num_steps=2)
+            loaded.load(filename)
+        self.assertEqual(len(loaded), len(buf))
+        self.check_all_windows(loaded, windows, terminal_ids)
+
+
+class TestUint8FrameReplayBuffer(unittest.TestCase):
+    """Covers the episode-boundary handling of Uint8FrameReplayBuffer."""
+
+    def feed_episode(self, buf, values, terminal, stack, action_offset=0):
+        """Append an episode whose observation frames carry `values`.
+
+        Returns a dict mapping action id to the expected transition.
+        """
+        expected = {}
+        for t in range(len(values) - 1):
+            state = stacked(values[:t + 1], stack)
+            next_state = stacked(values[:t + 2], stack)
+            is_last = t == len(values) - 2
+            action = action_offset + t
+            buf.append(
+                state=state,
+                action=action,
+                reward=float(action),
+                next_state=next_state,
+                is_state_terminal=terminal and is_last,
+            )
+            expected[action] = dict(
+                state=state,
+                next_state=next_state,
+                reward=float(action),
+                is_state_terminal=terminal and is_last,
+            )
+        buf.stop_current_episode()
+        return expected
+
+    def check_against(self, buf, expected, n):
+        sampled = buf.sample(n)
+        self.assertEqual(len(sampled), n)
+        for (transition,) in sampled:
+            ref = expected[transition['action']]
+            np.testing.assert_array_equal(
+                transition['state'], ref['state'])
+            np.testing.assert_array_equal(
+                transition['next_state'], ref['next_state'])
+            self.assertEqual(transition['reward'], ref['reward'])
+            self.assertEqual(
+                transition['is_state_terminal'], ref['is_state_terminal'])
+
+    def test_timeout_episode_boundary(self):
+        # Regression test: the last transition of an episode that ends
+        # without is_state_terminal (e.g. a ContinuingTimeLimit timeout)
+        # must get its true final observation as next_state, not the
+        # next episode's first frame.
+        buf = Uint8FrameReplayBuffer(capacity=100, frame_shape=(1, 2, 2),
+                                     stack=2)
+        expected = self.feed_episode(
+            buf, values=[1, 2, 3, 4], terminal=False, stack=2)
+        expected.update(self.feed_episode(
+            buf, values=[10, 11, 12], terminal=False, stack=2,
+            action_offset=10))
+        # 3 + 2 transitions; the frame-only slots do not count
+        self.assertEqual(len(buf), 5)
+        for _ in range(10):
+            self.check_against(buf, expected, 5)
+
+    def test_terminal_episode(self):
+        buf = Uint8FrameReplayBuffer(capacity=100, frame_shape=(1, 2, 2),
+                                     stack=2)
+        expected = self.feed_episode(
+            buf, values=[1, 2, 3], terminal=True, stack=2)
+        self.feed_episode(
+            buf, values=[10, 11, 12], terminal=True, stack=2,
+            action_offset=10)
+        self.assertEqual(len(buf), 4)
+        # the terminal transition's next_state is never used for
+        # bootstrapping, so only check the flags and scalars
+        for _ in range(10):
+            for (transition,) in buf.sample(3):
+                if transition['action'] in expected:
+                    ref = expected[transition['action']]
+                    np.testing.assert_array_equal(
+                        transition['state'], ref['state'])
+                    self.assertEqual(transition['is_state_terminal'],
+                                     ref['is_state_terminal'])
+
+    def test_ring_wrap(self):
+        buf = Uint8FrameReplayBuffer(capacity=13, frame_shape=(1, 2, 2),
+                                     stack=1)
+        expected = {}
+        value = 0
+        for episode in range(10):
+            n_obs = 3 + episode % 3
+            values = [(value + i) % 250 for i in range(n_obs)]
+            value += n_obs
+            expected.update(self.feed_episode(
+                buf, values=values, terminal=False, stack=1,
+                action_offset=10 * episode))
+            self.assertLessEqual(len(buf), buf.capacity)
+            n = min(len(buf), 4)
+            for _ in range(5):
+                self.check_against(buf, expected, n)
+
+    def test_save_load(self):
+        buf = Uint8FrameReplayBuffer(capacity=50, frame_shape=(1, 2, 2),
+                                     stack=2)
+        expected = self.feed_episode(
+            buf, values=[1, 2, 3, 4, 5], terminal=False, stack=2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'rbuf.npz')
+            buf.save(filename)
+            loaded = Uint8FrameReplayBuffer(
+                capacity=50, frame_shape=(1, 2, 2), stack=2)
+            loaded.load(filename)
+        self.assertEqual(len(loaded), len(buf))
+        for _ in range(10):
+            self.check_against(loaded, expected, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -183,9 +183,7 @@ class CategoricalDQN(dqn.DQN):
             # The loss per example is the sum of the atom-wise loss
             # Prioritization by KL-divergence
             delta = F.sum(eltwise_loss, axis=1)
-            delta = cuda.to_cpu(delta.array)
-            for e in delta:
-                errors_out.append(e)
+            errors_out.extend(cuda.to_cpu(delta.array))
 
         if 'weights' in exp_batch:
             return compute_weighted_value_loss(
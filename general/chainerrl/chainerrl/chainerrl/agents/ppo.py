@@ -34,16 +34,30 @@ def _elementwise_clip(x, x_min, x_max):
 
 def _add_advantage_and_value_target_to_episode(episode, gamma, lambd):
     """Add advantage and value target values to an episode."""
-    adv = 0.0
-    for transition in reversed(episode):
-        td_err = (
-            transition['reward']
-            + (gamma * transition['nonterminal'] * transition['next_v_pred'])
-            - transition['v_pred']
-        )
-        adv = td_err + gamma * lambd * adv
+    # Gather the per-transition scalars into float32 arrays so the TD
+    # errors are computed in one vectorized pass and the reverse scan
+    # below only touches a flat float32 buffer.
+    n = len(episode)
+    rewards = np.empty(n, dtype=np.float32)
+    nonterminals = np.empty(n, dtype=np.float32)
+    v_preds = np.empty(n, dtype=np.float32)
+    next_v_preds = np.empty(n, dtype=np.float32)
+    for i, transition in enumerate(episode):
+        rewards[i] = transition['reward']
+        nonterminals[i] = transition['nonterminal']
+        v_preds[i] = transition['v_pred']
+        next_v_preds[i] = transition['next_v_pred']
+    td_errs = rewards + gamma * nonterminals * next_v_preds - v_preds
+    advs = np.empty(n, dtype=np.float32)
+    decay = np.float32(gamma * lambd)
+    adv = np.float32(0)
+    for t in range(n - 1, -1, -1):
+        adv = td_errs[t] + decay * adv
+        advs[t] = adv
+    v_teachers = advs + v_preds
+    for transition, adv, v_teacher in zip(episode, advs, v_teachers):
         transition['adv'] = adv
-        transition['v_teacher'] = adv + transition['v_pred']
+        transition['v_teacher'] = v_teacher
 
 
 def _add_advantage_and_value_target_to_episodes(episodes, gamma, lambd):
@@ -272,6 +286,13 @@ class PPO(agent.AttributeSavingMixin, agent.BatchAgent):
             will encourage a minibatch to contain more and shorter sequences.
         act_deterministically (bool): If set to True, choose most probable
             actions in the act method instead of sampling from distributions.
+        use_soa_buffer (bool): If set to True, non-recurrent updates stack
+            the whole dataset into per-field arrays once and slice
+            minibatches out of them with permuted indices, instead of
+            walking the transition dicts for every minibatch. Epochs are
+            then plain shuffled passes, so the last minibatch of an epoch
+            may be smaller when the dataset size is not a multiple of
+            ``minibatch_size``.
         value_stats_window (int): Window size used to compute statistics
             of value predictions.
         entropy_stats_window (int): Window size used to compute statistics
@@ -316,6 +337,7 @@ class PPO(agent.AttributeSavingMixin, agent.BatchAgent):
                  recurrent=False,
                  max_recurrent_sequence_len=None,
                  act_deterministically=False,
+                 use_soa_buffer=False,
                  value_stats_window=1000,
                  entropy_stats_window=1000,
                  value_loss_stats_window=100,
@@ -346,6 +368,7 @@ class PPO(agent.AttributeSavingMixin, agent.BatchAgent):
         self.recurrent = recurrent
         self.max_recurrent_sequence_len = max_recurrent_sequence_len
         self.act_deterministically = act_deterministically
+        self.use_soa_buffer = use_soa_buffer
 
         self.xp = self.model.xp
 
@@ -432,9 +455,62 @@ class PPO(agent.AttributeSavingMixin, agent.BatchAgent):
             [b['state'] for b in dataset], self.obs_normalizer.xp, self.phi)
         self.obs_normalizer.experience(states)
 
+    def _update_soa(self, dataset):
+        """Update like `_update`, but minibatch from per-field arrays.
+
+        The dataset is stacked into one array per field up front;
+        each epoch then permutes the indices and fancy-indexes
+        minibatches out, so the per-minibatch Python work is a handful
+        of array slices instead of ``minibatch_size`` dict walks per
+        field.
+        """
+
+        if self.obs_normalizer:
+            self._update_obs_normalizer(dataset)
+
+        xp = self.model.xp
+
+        assert 'state' in dataset[0]
+        assert 'v_teacher' in dataset[0]
+
+        states = self.batch_states(
+            [b['state'] for b in dataset], xp, self.phi)
+        if self.obs_normalizer:
+            states = self.obs_normalizer(states, update=False)
+        actions = xp.array([b['action'] for b in dataset])
+        advs = xp.array([b['adv'] for b in dataset], dtype=xp.float32)
+        if self.standardize_advantages:
+            advs = (advs - advs.mean()) / (advs.std() + 1e-8)
+        log_probs_old = xp.array(
+            [b['log_prob'] for b in dataset], dtype=xp.float32)
+        # Same shape as vs_pred: (dataset_size, 1)
+        vs_pred_old = xp.array(
+            [b['v_pred'] for b in dataset], dtype=xp.float32)[..., None]
+        vs_teacher = xp.array(
+            [b['v_teacher'] for b in dataset], dtype=xp.float32)[..., None]
+
+        n = len(dataset)
+        for _ in range(self.epochs):
+            perm = xp.asarray(np.random.permutation(n))
+            for i in range(0, n, self.minibatch_size):
+                indices = perm[i:i + self.minibatch_size]
+                distribs, vs_pred = self.model(states[indices])
+                self.optimizer.update(
+                    self._lossfun,
+                    distribs.entropy, vs_pred,
+                    distribs.log_prob(actions[indices]),
+                    vs_pred_old=vs_pred_old[indices],
+                    log_probs_old=log_probs_old[indices],
+                    advs=advs[indices],
+                    vs_teacher=vs_teacher[indices],
+                )
+
     def _update(self, dataset):
         """Update both the policy and the value function."""
 
+        if self.use_soa_buffer:
+            return self._update_soa(dataset)
+
         if self.obs_normalizer:
             self._update_obs_normalizer(dataset)
 
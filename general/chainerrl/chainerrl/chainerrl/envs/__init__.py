@@ -1,2 +1,3 @@
 from chainerrl.envs.multiprocess_vector_env import MultiprocessVectorEnv  # NOQA
 from chainerrl.envs.serial_vector_env import SerialVectorEnv  # NOQA
+from chainerrl.envs.shmem_vector_env import ShmemVectorEnv  # NOQA
@@ -0,0 +1,208 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+from multiprocessing import Pipe
+from multiprocessing import Process
+from multiprocessing import sharedctypes
+import signal
+
+import numpy as np
+
+import chainerrl
+
+
+def _pinned_empty(shape, dtype):
+    """Allocate an uninitialized ndarray backed by page-locked memory.
+
+    Allocations come from CuPy's pinned memory pool, so after warm-up
+    this is about as cheap as ``np.empty``.
+    """
+    import cupy
+    dtype = np.dtype(dtype)
+    n_items = int(np.prod(shape, dtype=np.int64))
+    mem = cupy.cuda.alloc_pinned_memory(n_items * dtype.itemsize)
+    return np.frombuffer(mem, dtype, n_items).reshape(shape)
+
+
+def _write_obs(obs_view, ob):
+    ob = np.asarray(ob)
+    assert ob.dtype == obs_view.dtype and ob.shape == obs_view.shape, \
+        'observation dtype/shape ({}, {}) does not match the shared' \
+        ' block ({}, {})'.format(
+            ob.dtype, ob.shape, obs_view.dtype, obs_view.shape)
+    obs_view[...] = ob
+
+
+def worker(remote, env_fn, obs_buf, obs_shape, obs_dtype):
+    # Ignore CTRL+C in the worker process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    env = env_fn()
+    obs_view = np.frombuffer(obs_buf, dtype=obs_dtype).reshape(obs_shape)
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == 'step':
+                ob, reward, done, info = env.step(data)
+                _write_obs(obs_view, ob)
+                remote.send((reward, done, info))
+            elif cmd == 'reset':
+                _write_obs(obs_view, env.reset())
+                remote.send(None)
+            elif cmd == 'close':
+                remote.close()
+                break
+            elif cmd == 'spec':
+                remote.send(env.spec)
+            elif cmd == 'seed':
+                remote.send(env.seed(data))
+            else:
+                raise NotImplementedError
+    finally:
+        env.close()
+
+
+class ShmemVectorEnv(chainerrl.env.VectorEnv):
+    """VectorEnv that passes observations via shared memory.
+
+    Same semantics as MultiprocessVectorEnv, but each subprocess writes
+    its observation into a preallocated shared-memory block instead of
+    pickling it through its pipe, so the per-step pipe payload shrinks to
+    the (reward, done, info) tuple. Observations must therefore be
+    fixed-shape arrays, i.e. the observation space must be a Box.
+
+    Args:
+        env_fns (list of callable): List of callables, each of which
+            returns gym.Env that is run in its own subprocess. The first
+            one is also called (and reset once) in the parent process to
+            determine the observation and action spaces and the shape
+            and dtype of the shared blocks.
+        pin_memory (bool): If True, the observation arrays returned by
+            `step` and `reset` are allocated from CuPy's pinned memory
+            pool, so a subsequent host-to-device transfer (e.g.
+            `cupy.asarray` in the agent) runs as a DMA at full bus
+            bandwidth instead of going through a pageable staging copy.
+            Requires CuPy; only useful when the agent runs on GPU.
+    """
+
+    def __init__(self, env_fns, pin_memory=False):
+        dummy_env = env_fns[0]()
+        self.action_space = dummy_env.action_space
+        self.observation_space = dummy_env.observation_space
+        # Wrappers such as CastObservationToFloat32 change the
+        # observation dtype without updating observation_space, so size
+        # the shared blocks from an actual observation rather than from
+        # the space.
+        sample_obs = np.asarray(dummy_env.reset())
+        dummy_env.close()
+        del dummy_env
+
+        obs_shape = sample_obs.shape
+        obs_dtype = sample_obs.dtype
+        nbytes = int(np.prod(obs_shape, dtype=np.int64)) * obs_dtype.itemsize
+
+        nenvs = len(env_fns)
+        self.obs_bufs = [sharedctypes.RawArray('b', nbytes)
+                         for _ in range(nenvs)]
+        self.obs_views = [
+            np.frombuffer(obs_buf, dtype=obs_dtype).reshape(obs_shape)
+            for obs_buf in self.obs_bufs]
+        self.remotes, self.work_remotes = zip(*[Pipe() for _ in range(nenvs)])
+        self.ps = \
+            [Process(target=worker,
+                     args=(work_remote, env_fn, obs_buf,
+                           obs_shape, obs_dtype.str))
+             for (work_remote, env_fn, obs_buf)
+             in zip(self.work_remotes, env_fns, self.obs_bufs)]
+        for p in self.ps:
+            p.start()
+        self.pin_memory = pin_memory
+        self.last_obs = [None] * self.num_envs
+        self.closed = False
+
+    def __del__(self):
+        if not self.closed:
+            self.close()
+
+    @property
+    def spec(self):
+        self._assert_not_closed()
+        self.remotes[0].send(('spec', None))
+        return self.remotes[0].recv()
+
+    def step(self, actions):
+        self._assert_not_closed()
+        for remote, action in zip(self.remotes, actions):
+            remote.send(('step', action))
+        results = [remote.recv() for remote in self.remotes]
+        rews, dones, infos = zip(*results)
+        # copy out of the shared blocks so that returned observations stay
+        # valid after the next step
+        self.last_obs = [self._copy_out(view) for view in self.obs_views]
+        return self.last_obs, rews, dones, infos
+
+    def reset(self, mask=None):
+        self._assert_not_closed()
+        if mask is None:
+            mask = np.zeros(self.num_envs)
+        for m, remote in zip(mask, self.remotes):
+            if not m:
+                remote.send(('reset', None))
+
+        obs = []
+        for m, remote, view, o in zip(
+                mask, self.remotes, self.obs_views, self.last_obs):
+            if not m:
+                remote.recv()
+                obs.append(self._copy_out(view))
+            else:
+                obs.append(o)
+        self.last_obs = obs
+        return obs
+
+    def _copy_out(self, view):
+        if self.pin_memory:
+            out = _pinned_empty(view.shape, view.dtype)
+            out[...] = view
+            return out
+        return view.copy()
+
+    def close(self):
+        self._assert_not_closed()
+        self.closed = True
+        for remote in self.remotes:
+            remote.send(('close', None))
+        for p in self.ps:
+            p.join()
+
+    def seed(self, seeds=None):
+        self._assert_not_closed()
+        if seeds is not None:
+            if isinstance(seeds, int):
+                seeds = [seeds] * self.num_envs
+            elif isinstance(seeds, list):
+                if len(seeds) != self.num_envs:
+                    raise ValueError(
+                        "length of seeds must be same as num_envs {}"
+                        .format(self.num_envs))
+            else:
+                raise TypeError(
+                    "Type of Seeds {} is not supported.".format(type(seeds)))
+        else:
+            seeds = [None] * self.num_envs
+
+        for remote, seed in zip(self.remotes, seeds):
+            remote.send(('seed', seed))
+        results = [remote.recv() for remote in self.remotes]
+        return results
+
+    @property
+    def num_envs(self):
+        return len(self.remotes)
+
+    def _assert_not_closed(self):
+        assert not self.closed, "This env is already closed"
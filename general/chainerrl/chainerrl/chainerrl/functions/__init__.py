@@ -1,3 +1,5 @@
+from chainerrl.functions.exp2x import exp2x  # NOQA
+from chainerrl.functions.exp2x import Exp2x  # NOQA
 from chainerrl.functions.mul_add import muladd  # NOQA
 from chainerrl.functions.sum_arrays import sum_arrays  # NOQA
 from chainerrl.functions.sum_arrays import SumArrays  # NOQA
@@ -97,21 +97,17 @@ class EmpiricalNormalization(chainer.Link):
             ndarray or Variable: Normalized output values
         """
 
-        xp = self.xp
-        mean = xp.broadcast_to(self._mean, x.shape)
-        std_inv = xp.broadcast_to(self._std_inverse, x.shape)
-
         if update:
             self.experience(x)
 
-        normalized = (x - mean) * std_inv
+        # _mean/_std_inverse keep the batch axis as size 1, so they
+        # broadcast against x without materializing expanded views
+        normalized = (x - self._mean) * self._std_inverse
         if self.clip_threshold is not None:
-            normalized = xp.clip(
+            normalized = self.xp.clip(
                 normalized, -self.clip_threshold, self.clip_threshold)
         return normalized
 
     def inverse(self, y):
         xp = self.xp
-        mean = xp.broadcast_to(self._mean, y.shape)
-        std = xp.broadcast_to(xp.sqrt(self._var + self.eps), y.shape)
-        return y * std + mean
+        return y * xp.sqrt(self._var + self.eps) + self._mean
@@ -106,5 +106,16 @@ class RandomAccessQueue(object):
 
         return self._queue_front.pop()
 
+    def getitems(self, indices):
+        """Get items at given non-negative indices in one pass.
+
+        Unlike repeated `__getitem__` calls, the front/back split and the
+        list attribute lookups are resolved only once for the whole batch.
+        """
+        nf = len(self._queue_front)
+        front = self._queue_front
+        back = self._queue_back
+        return [front[~i] if i < nf else back[i - nf] for i in indices]
+
     def sample(self, k):
-        return [self[i] for i in sample_n_k(len(self), k)]
+        return self.getitems(sample_n_k(len(self), k))
@@ -113,6 +113,201 @@ class PrioritizedBuffer (object):
         return indices, probabilities
 
 
+class FlatPrioritizedBuffer(object):
+    """Drop-in for `PrioritizedBuffer` backed by flat NumPy segment trees.
+
+    Priorities live in contiguous arrays laid out as perfect binary trees
+    (node i's children are 2i and 2i+1), so batch sampling descends all
+    tree levels with vectorized index arithmetic and batch priority
+    updates propagate level by level with fancy indexing, instead of
+    traversing a Python object tree once per sampled transition.
+
+    Requires a bounded capacity; data slots are reused ring-buffer style.
+    """
+
+    def __init__(self, capacity, wait_priority_after_sampling=True,
+                 initial_max_priority=1.0):
+        assert capacity is not None
+        self.capacity = capacity
+        n_leaves = 1
+        while n_leaves < capacity:
+            n_leaves *= 2
+        self._n_leaves = n_leaves
+        # priority sums; leaf for slot i is at index n_leaves + i
+        self._sums = np.zeros(2 * n_leaves, dtype=np.float64)
+        # priority minimum over occupied slots
+        self._mins = np.full(2 * n_leaves, np.inf, dtype=np.float64)
+        self.data = [None] * capacity
+        self._start = 0  # slot of the oldest element
+        self.length = 0
+        self.max_priority = initial_max_priority
+        self.wait_priority_after_sampling = wait_priority_after_sampling
+        self.flag_wait_priority = False
+        self.sampled_indices = []
+
+    def __len__(self):
+        return self.length
+
+    def _slots(self, queue_indices):
+        return (self._start + np.asarray(queue_indices)) % self.capacity
+
+    def _set_priorities(self, slots, priorities):
+        """Write leaf priorities and propagate both trees to the root."""
+        slots = np.asarray(slots, dtype=np.int64)
+        nodes = self._n_leaves + slots
+        self._sums[nodes] = priorities
+        self._mins[nodes] = priorities
+        parents = np.unique(nodes // 2)
+        while parents[0] >= 1:
+            left = 2 * parents
+            self._sums[parents] = self._sums[left] + self._sums[left + 1]
+            self._mins[parents] = np.minimum(
+                self._mins[left], self._mins[left + 1])
+            if parents[0] == 1:
+                break
+            parents = np.unique(parents // 2)
+
+    def append(self, value, priority=None):
+        if self.length == self.capacity:
+            self.popleft()
+        if priority is None:
+            # Append with the highest priority
+            priority = self.max_priority
+        slot = (self._start + self.length) % self.capacity
+        self.data[slot] = value
+        self.length += 1
+        self._set_priorities(np.array([slot]), priority)
+
+    def popleft(self):
+        assert self.length > 0
+        slot = self._start
+        value = self.data[slot]
+        self.data[slot] = None
+        self._set_priorities(np.array([slot]), 0.0)
+        self._mins[self._n_leaves + slot] = np.inf
+        self._propagate_mins(np.array([slot]))
+        self._start = (self._start + 1) % self.capacity
+        self.length -= 1
+        return value
+
+    def _propagate_mins(self, slots):
+        parents = np.unique((self._n_leaves + np.asarray(slots)) // 2)
+        while parents[0] >= 1:
+            left = 2 * parents
+            self._mins[parents] = np.minimum(
+                self._mins[left], self._mins[left + 1])
+            if parents[0] == 1:
+                break
+            parents = np.unique(parents // 2)
+
+    def _descend(self, us):
+        """Vectorized root-to-leaf descent for an array of cumulative sums."""
+        idx = np.ones(len(us), dtype=np.int64)
+        us = np.array(us, dtype=np.float64)
+        while idx[0] < self._n_leaves:
+            left = 2 * idx
+            left_sums = self._sums[left]
+            go_right = us >= left_sums
+            us -= np.where(go_right, left_sums, 0.0)
+            idx = np.where(go_right, left + 1, left)
+        slots = idx - self._n_leaves
+        # rounding at subtree boundaries can land on an empty slot;
+        # clamp to the newest occupied one
+        queue_ixs = (slots - self._start) % self.capacity
+        return np.minimum(queue_ixs, self.length - 1)
+
+    def _sample_distinct_prioritized(self, n, exclude=()):
+        """Sample n distinct queue indices proportionally to priority.
+
+        Already-picked leaves are zeroed (restored by
+        `set_last_priority`), so redraws for duplicates are rare.
+        """
+        picked = []
+        picked_priorities = []
+        while len(picked) < n:
+            total = self._sums[1]
+            assert total > 0.0
+            us = np.random.uniform(0.0, total, size=n - len(picked))
+            for qi in self._descend(us):
+                qi = int(qi)
+                if qi in picked or qi in exclude:
+                    continue
+                slot = (self._start + qi) % self.capacity
+                picked.append(qi)
+                picked_priorities.append(
+                    float(self._sums[self._n_leaves + slot]))
+                self._set_priorities(np.array([slot]), 0.0)
+        return picked, picked_priorities
+
+    def _sample_indices_and_probabilities(self, n, uniform_ratio):
+        total_priority = self._sums[1]
+        min_prob = self._mins[1] / total_priority
+        indices = []
+        priorities = []
+        if uniform_ratio > 0:
+            # Mix uniform samples and prioritized samples
+            n_uniform = np.random.binomial(n, uniform_ratio)
+            un_indices = [
+                int(i) for i in sample_n_k(self.length, n_uniform)]
+            for qi in un_indices:
+                slot = (self._start + qi) % self.capacity
+                priorities.append(float(self._sums[self._n_leaves + slot]))
+                self._set_priorities(np.array([slot]), 0.0)
+            indices.extend(un_indices)
+            n -= n_uniform
+            min_prob = uniform_ratio / self.length \
+                + (1 - uniform_ratio) * min_prob
+
+        pr_indices, pr_priorities = self._sample_distinct_prioritized(
+            n, exclude=indices)
+        indices.extend(pr_indices)
+        priorities.extend(pr_priorities)
+
+        if not self.wait_priority_after_sampling:
+            self._restore_priorities(indices, priorities)
+
+        probs = [
+            uniform_ratio / self.length
+            + (1 - uniform_ratio) * pri / total_priority
+            for pri in priorities
+        ]
+        return indices, probs, min_prob
+
+    def _restore_priorities(self, queue_indices, priorities):
+        self._set_priorities(self._slots(queue_indices), priorities)
+
+    def sample(self, n, uniform_ratio=0):
+        """Sample data along with their corresponding probabilities.
+
+        Args:
+            n (int): Number of data to sample.
+            uniform_ratio (float): Ratio of uniformly sampled data.
+        Returns:
+            sampled data (list)
+            probabitilies (list)
+        """
+        assert (not self.wait_priority_after_sampling or
+                not self.flag_wait_priority)
+        indices, probabilities, min_prob = \
+            self._sample_indices_and_probabilities(
+                n, uniform_ratio=uniform_ratio)
+        sampled = [self.data[(self._start + i) % self.capacity]
+                   for i in indices]
+        self.sampled_indices = indices
+        self.flag_wait_priority = True
+        return sampled, probabilities, min_prob
+
+    def set_last_priority(self, priority):
+        assert (not self.wait_priority_after_sampling or
+                self.flag_wait_priority)
+        assert all([p > 0.0 for p in priority])
+        assert len(self.sampled_indices) == len(priority)
+        self._restore_priorities(self.sampled_indices, priority)
+        self.max_priority = max(self.max_priority, max(priority))
+        self.flag_wait_priority = False
+        self.sampled_indices = []
+
+
 # Implement operations on nodes of SumTreeQueue
 
 def _expand(node):
@@ -1,2 +1,3 @@
+from chainerrl.optimizers.factored_adam import FactoredAdam  # noqa
 from chainerrl.optimizers.nonbias_weight_decay import NonbiasWeightDecay  # noqa
 from chainerrl.optimizers.rmsprop_async import RMSpropAsync  # noqa
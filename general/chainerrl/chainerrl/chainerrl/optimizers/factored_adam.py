@@ -0,0 +1,109 @@
+from __future__ import division
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import math
+
+from chainer import cuda
+from chainer import optimizer
+
+
+_default_hyperparam = optimizer.Hyperparameter()
+_default_hyperparam.alpha = 0.001
+_default_hyperparam.beta1 = 0.9
+_default_hyperparam.beta2 = 0.999
+_default_hyperparam.eps = 1e-8
+
+
+class FactoredAdamRule(optimizer.UpdateRule):
+
+    def __init__(self, parent_hyperparam=None,
+                 alpha=None, beta1=None, beta2=None, eps=None):
+        super(FactoredAdamRule, self).__init__(
+            parent_hyperparam or _default_hyperparam)
+        if alpha is not None:
+            self.hyperparam.alpha = alpha
+        if beta1 is not None:
+            self.hyperparam.beta1 = beta1
+        if beta2 is not None:
+            self.hyperparam.beta2 = beta2
+        if eps is not None:
+            self.hyperparam.eps = eps
+
+    def init_state(self, param):
+        xp = cuda.get_array_module(param.array)
+        with cuda.get_device_from_array(param.array):
+            self.state['m'] = xp.zeros_like(param.array)
+            if param.array.ndim == 2:
+                n_out, n_in = param.array.shape
+                self.state['vr'] = xp.zeros(n_out, dtype=param.array.dtype)
+                self.state['vc'] = xp.zeros(n_in, dtype=param.array.dtype)
+            else:
+                self.state['v'] = xp.zeros_like(param.array)
+
+    def update_core(self, param):
+        grad = param.grad
+        if grad is None:
+            return
+        hp = self.hyperparam
+        xp = cuda.get_array_module(param.array)
+
+        m = self.state['m']
+        m += (1 - hp.beta1) * (grad - m)
+
+        if param.array.ndim == 2:
+            # factored second moment: EMAs of the row and column means of
+            # grad**2 instead of the full (out, in) tensor
+            sq = grad * grad
+            vr = self.state['vr']
+            vc = self.state['vc']
+            vr += (1 - hp.beta2) * (sq.mean(axis=1) - vr)
+            vc += (1 - hp.beta2) * (sq.mean(axis=0) - vc)
+            v = vr[:, None] * vc[None, :] / (vr.mean() + 1e-30)
+        else:
+            v = self.state['v']
+            v += (1 - hp.beta2) * (grad * grad - v)
+
+        fix1 = 1 - hp.beta1 ** self.t
+        fix2 = 1 - hp.beta2 ** self.t
+        lr = hp.alpha * math.sqrt(fix2) / fix1
+        param.array -= lr * m / (xp.sqrt(v) + hp.eps)
+
+
+class FactoredAdam(optimizer.GradientMethod):
+
+    """Adam with a factored second moment for matrix parameters.
+
+    For 2-D parameters (i.e. Linear/Convolution weights viewed as
+    matrices), the per-element second-moment accumulator of Adam is
+    replaced by exponential moving averages of the row and column means
+    of the squared gradient, reconstructed on update as
+    ``outer(vr, vc) / mean(vr)`` as in Adafactor
+    (https://arxiv.org/abs/1804.04235). This shrinks the second-moment
+    state of an (out, in) weight from out*in to out+in values. Biases
+    and other non-matrix parameters keep the exact Adam accumulator.
+    The first moment is kept in full either way, so the update matches
+    Adam except for the factored approximation of v.
+    """
+
+    def __init__(self, alpha=_default_hyperparam.alpha,
+                 beta1=_default_hyperparam.beta1,
+                 beta2=_default_hyperparam.beta2,
+                 eps=_default_hyperparam.eps):
+        super(FactoredAdam, self).__init__()
+        self.hyperparam.alpha = alpha
+        self.hyperparam.beta1 = beta1
+        self.hyperparam.beta2 = beta2
+        self.hyperparam.eps = eps
+
+    alpha = optimizer.HyperparameterProxy('alpha')
+    beta1 = optimizer.HyperparameterProxy('beta1')
+    beta2 = optimizer.HyperparameterProxy('beta2')
+    eps = optimizer.HyperparameterProxy('eps')
+
+    def create_update_rule(self):
+        return FactoredAdamRule(self.hyperparam)
@@ -140,6 +140,32 @@ def random_subseq(seq, subseq_len):
         return seq[i:i + subseq_len]
 
 
+def _nstep_discounted_rewards(experiences, gamma):
+    """Compute discounted n-step reward sums and discounts, vectorized.
+
+    Replaces the per-transition Python loop accumulating
+    ``sum(gamma ** i * r_i)`` with one padded float32 matrix-vector product
+    over the whole batch, which matters when num_steps > 1.
+
+    Returns:
+        tuple of float32 ndarrays (rewards, discounts), both of length
+        ``len(experiences)``.
+    """
+    lengths = np.array([len(exp) for exp in experiences], dtype=np.int32)
+    gamma = np.float32(gamma)
+    discounts = gamma ** lengths.astype(np.float32)
+    max_len = int(lengths.max())
+    if max_len == 1:
+        rewards = np.array([exp[0]['reward'] for exp in experiences],
+                           dtype=np.float32)
+    else:
+        padded = np.zeros((len(experiences), max_len), dtype=np.float32)
+        for i, exp in enumerate(experiences):
+            padded[i, :len(exp)] = [transition['reward'] for transition in exp]
+        rewards = padded.dot(gamma ** np.arange(max_len, dtype=np.float32))
+    return rewards, discounts
+
+
 def batch_experiences(experiences, xp, phi, gamma, batch_states=batch_states):
     """Takes a batch of k experiences each of which contains j
 
@@ -161,14 +187,12 @@ def batch_experiences(experiences, xp, phi, gamma, batch_states=batch_states):
         dict of batched transitions
     """
 
+    rewards, discounts = _nstep_discounted_rewards(experiences, gamma)
     batch_exp = {
         'state': batch_states(
             [elem[0]['state'] for elem in experiences], xp, phi),
         'action': xp.asarray([elem[0]['action'] for elem in experiences]),
-        'reward': xp.asarray([sum((gamma ** i) * exp[i]['reward']
-                                  for i in range(len(exp)))
-                              for exp in experiences],
-                             dtype=np.float32),
+        'reward': xp.asarray(rewards),
         'next_state': batch_states(
             [elem[-1]['next_state']
              for elem in experiences], xp, phi),
@@ -176,8 +200,7 @@ def batch_experiences(experiences, xp, phi, gamma, batch_states=batch_states):
             [any(transition['is_state_terminal']
                  for transition in exp) for exp in experiences],
             dtype=np.float32),
-        'discount': xp.asarray([(gamma ** len(elem))for elem in experiences],
-                               dtype=np.float32)}
+        'discount': xp.asarray(discounts)}
     if all(elem[-1]['next_action'] is not None for elem in experiences):
         batch_exp['next_action'] = xp.asarray(
             [elem[-1]['next_action'] for elem in experiences])
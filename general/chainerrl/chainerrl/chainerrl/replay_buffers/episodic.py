@@ -55,7 +55,8 @@ class EpisodicReplayBuffer(AbstractEpisodicReplayBuffer):
 
     def save(self, filename):
         with open(filename, 'wb') as f:
-            pickle.dump((self.memory, self.episodic_memory), f)
+            pickle.dump((self.memory, self.episodic_memory), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
 
     def load(self, filename):
         with open(filename, 'rb') as f:
@@ -10,6 +10,7 @@ import collections
 
 import numpy as np
 
+from chainerrl.misc.prioritized import FlatPrioritizedBuffer
 from chainerrl.misc.prioritized import PrioritizedBuffer
 from chainerrl.replay_buffers.replay_buffer import ReplayBuffer  # NOQA
 
@@ -101,9 +102,15 @@ class PrioritizedReplayBuffer(ReplayBuffer, PriorityWeightError):
         self.capacity = capacity
         assert num_steps > 0
         self.num_steps = num_steps
-        self.memory = PrioritizedBuffer(capacity=capacity)
+        if capacity is None:
+            self.memory = PrioritizedBuffer(capacity=capacity)
+        else:
+            # flat-array segment trees allow vectorized sampling and
+            # priority updates, but need the capacity up front
+            self.memory = FlatPrioritizedBuffer(capacity)
         self.last_n_transitions = collections.defaultdict(
             lambda: collections.deque([], maxlen=num_steps))
+        self._env0_transitions = self.last_n_transitions[0]
         PriorityWeightError.__init__(
             self, alpha, beta0, betasteps, eps, normalize_by_max,
             error_min=error_min, error_max=error_max)
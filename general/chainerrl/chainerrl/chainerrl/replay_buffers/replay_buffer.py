@@ -32,10 +32,16 @@ class ReplayBuffer(replay_buffer.AbstractReplayBuffer):
         self.memory = RandomAccessQueue(maxlen=capacity)
         self.last_n_transitions = collections.defaultdict(
             lambda: collections.deque([], maxlen=num_steps))
+        # env 0's deque cached directly; single-env training then skips the
+        # defaultdict lookup that `append` would otherwise do every step
+        self._env0_transitions = self.last_n_transitions[0]
 
     def append(self, state, action, reward, next_state=None, next_action=None,
                is_state_terminal=False, env_id=0, **kwargs):
-        last_n_transitions = self.last_n_transitions[env_id]
+        if env_id == 0:
+            last_n_transitions = self._env0_transitions
+        else:
+            last_n_transitions = self.last_n_transitions[env_id]
         experience = dict(
             state=state,
             action=action,
@@ -56,7 +62,10 @@ class ReplayBuffer(replay_buffer.AbstractReplayBuffer):
                 self.memory.append(list(last_n_transitions))
 
     def stop_current_episode(self, env_id=0):
-        last_n_transitions = self.last_n_transitions[env_id]
+        if env_id == 0:
+            last_n_transitions = self._env0_transitions
+        else:
+            last_n_transitions = self.last_n_transitions[env_id]
         # if n-step transition hist is not full, add transition;
         # if n-step hist is indeed full, transition has already been added;
         if 0 < len(last_n_transitions) < self.num_steps:
@@ -78,7 +87,10 @@ class ReplayBuffer(replay_buffer.AbstractReplayBuffer):
 
     def save(self, filename):
         with open(filename, 'wb') as f:
-            pickle.dump(self.memory, f)
+            # the default protocol serializes every ndarray through the
+            # generic reducer; the highest available protocol writes
+            # their buffers directly
+            pickle.dump(self.memory, f, protocol=pickle.HIGHEST_PROTOCOL)
 
     def load(self, filename):
         with open(filename, 'rb') as f:
@@ -1,5 +1,6 @@
 from chainerrl.wrappers.cast_observation import CastObservation  # NOQA
 from chainerrl.wrappers.cast_observation import CastObservationToFloat32  # NOQA
+from chainerrl.wrappers.cast_observation import CastObservationToFloat32InPlace  # NOQA
 
 from chainerrl.wrappers.continuing_time_limit import ContinuingTimeLimit  # NOQA
 
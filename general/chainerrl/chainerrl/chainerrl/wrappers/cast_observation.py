@@ -42,3 +42,30 @@ class CastObservationToFloat32(CastObservation):
 
     def __init__(self, env):
         super().__init__(env, np.float32)
+
+
+class CastObservationToFloat32InPlace(gym.ObservationWrapper):
+    """Cast observations to float32 into a buffer reused across steps.
+
+    Unlike CastObservationToFloat32, which allocates a fresh array per
+    step when the source dtype differs, this writes into a single
+    preallocated buffer. The same array object is therefore returned on
+    every step: only use this where observations are copied before being
+    retained, e.g. inside the subprocesses of MultiprocessVectorEnv or
+    ShmemVectorEnv, whose process boundary copies them anyway.
+
+    Args:
+        env: Env to wrap. Its observation space must be a Box.
+
+    Attributes:
+        original_observation: Observation before casting.
+    """
+
+    def __init__(self, env):
+        super().__init__(env)
+        self._buf = np.empty(env.observation_space.shape, dtype=np.float32)
+
+    def observation(self, observation):
+        self.original_observation = observation
+        np.copyto(self._buf, observation, casting='unsafe')
+        return self._buf
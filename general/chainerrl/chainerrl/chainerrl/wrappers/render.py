@@ -6,6 +6,8 @@ from builtins import *  # NOQA
 from future import standard_library
 standard_library.install_aliases()  # NOQA
 
+import functools
+
 import gym
 
 
@@ -20,13 +22,18 @@ class Render(gym.Wrapper):
     def __init__(self, env, **kwargs):
         super().__init__(env)
         self._kwargs = kwargs
+        # bind the render call once instead of unpacking kwargs per step
+        if kwargs:
+            self._render = functools.partial(env.render, **kwargs)
+        else:
+            self._render = env.render
 
     def reset(self, **kwargs):
         ret = self.env.reset(**kwargs)
-        self.env.render(**self._kwargs)
+        self._render()
         return ret
 
     def step(self, action):
         ret = self.env.step(action)
-        self.env.render(**self._kwargs)
+        self._render()
         return ret
@@ -3,13 +3,6 @@
 This script follows the settings of https://arxiv.org/abs/1709.06560 as much
 as possible.
 """
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-from __future__ import absolute_import
-from builtins import *  # NOQA
-from future import standard_library
-standard_library.install_aliases()  # NOQA
 import argparse
 import functools
 
@@ -26,6 +19,67 @@ from chainerrl import experiments
 from chainerrl import misc
 
 
+def _make_env(config):
+    """Build one worker env from a plain config dict.
+
+    Module-level so that subprocess vector envs pickle this function and
+    a small dict per worker instead of a closure over the full argparse
+    namespace.
+    """
+    env = gym.make(config['env'])
+    env.seed(config['seed'])
+    # Cast observations to float32 because our model uses float32.
+    # Inside a subprocess the observation is copied across the process
+    # boundary anyway, so the cast can reuse one buffer across steps
+    # instead of allocating per step.
+    if config['in_subprocess']:
+        env = chainerrl.wrappers.CastObservationToFloat32InPlace(env)
+    else:
+        env = chainerrl.wrappers.CastObservationToFloat32(env)
+    if config['monitor']:
+        env = chainerrl.wrappers.Monitor(env, config['outdir'])
+    if config['render']:
+        env = chainerrl.wrappers.Render(env)
+    return env
+
+
+class FusedFirstLayerBranched(chainer.Chain):
+    """Policy/value model whose first layers run as a single matmul.
+
+    Both trunks take the same observation, so their first Linear layers
+    are concatenated into one double-width weight: one BLAS call instead
+    of two, with the activation applied before splitting (tanh is
+    elementwise, so split-then-tanh and tanh-then-split agree).
+    Equivalent to ``chainerrl.links.Branched(policy, vf)`` apart from
+    the parameter layout.
+    """
+
+    def __init__(self, first, policy_tail, vf_tail):
+        super().__init__()
+        with self.init_scope():
+            self.first = first
+            self.policy_tail = policy_tail
+            self.vf_tail = vf_tail
+
+    def __call__(self, x):
+        h = F.tanh(self.first(x))
+        hp, hv = F.split_axis(h, 2, axis=1)
+        return self.policy_tail(hp), self.vf_tail(hv)
+
+
+class StaticSequential(chainer.Sequential):
+    """`Sequential` whose forward pass is traced once per input shape.
+
+    With `chainer.static_graph`, the define-by-run graph is captured on
+    the first call for a given input shape and replayed afterwards,
+    skipping Python-level op dispatch on every subsequent forward. Only
+    chains that return Variables can be traced, so the policy's Gaussian
+    head has to stay outside the static part.
+    """
+
+    forward = chainer.static_graph(chainer.Sequential.forward)
+
+
 def main():
     import logging
 
@@ -67,6 +121,23 @@ def main():
                              ' iteration.')
     parser.add_argument('--batch-size', type=int, default=64,
                         help='Minibatch size')
+    parser.add_argument('--fused-first-layer', action='store_true',
+                        default=False,
+                        help='Evaluate the first policy and value layers as'
+                             ' one concatenated matmul. Changes the parameter'
+                             ' layout; not combinable with --static-graph or'
+                             ' --mixed16.')
+    parser.add_argument('--mixed16', action='store_true', default=False,
+                        help='Train with float16 activations/weights (fp32'
+                             ' master weights in the optimizer).')
+    parser.add_argument('--factored-adam', action='store_true', default=False,
+                        help='Use Adam with Adafactor-style factored second'
+                             ' moments for matrix parameters, cutting'
+                             ' optimizer memory.')
+    parser.add_argument('--static-graph', action='store_true', default=False,
+                        help='Capture the policy/value trunks with'
+                             ' chainer.static_graph so their forward passes'
+                             ' are traced once per input shape and replayed.')
     args = parser.parse_args()
 
     logging.basicConfig(level=args.logger_level)
@@ -74,32 +145,50 @@ def main():
     # Set a random seed used in ChainerRL
     misc.set_random_seed(args.seed, gpus=(args.gpu,))
 
+    if args.mixed16:
+        # fp16 forward/backward; the optimizer keeps fp32 master weights
+        # and scales the loss (see `opt.loss_scaling()` below)
+        chainer.global_config.dtype = chainer.mixed16
+
     # Set different random seeds for different subprocesses.
     # If seed=0 and processes=4, subprocess seeds are [0, 1, 2, 3].
     # If seed=1 and processes=4, subprocess seeds are [4, 5, 6, 7].
     process_seeds = np.arange(args.num_envs) + args.seed * args.num_envs
     assert process_seeds.max() < 2 ** 32
+    # Resolve the per-env seeds once; test envs mirror the train seeds
+    # from the top of the 32-bit range.
+    train_seeds = process_seeds.astype(np.int64)
+    test_seeds = 2 ** 32 - 1 - train_seeds
 
     args.outdir = experiments.prepare_output_dir(args, args.outdir)
 
-    def make_env(process_idx, test):
-        env = gym.make(args.env)
-        # Use different random seeds for train and test envs
-        process_seed = int(process_seeds[process_idx])
-        env_seed = 2 ** 32 - 1 - process_seed if test else process_seed
-        env.seed(env_seed)
-        # Cast observations to float32 because our model uses float32
-        env = chainerrl.wrappers.CastObservationToFloat32(env)
-        if args.monitor:
-            env = chainerrl.wrappers.Monitor(env, args.outdir)
-        if args.render:
-            env = chainerrl.wrappers.Render(env)
-        return env
+    def env_config(process_idx, test, in_subprocess=False):
+        seeds = test_seeds if test else train_seeds
+        return {
+            'env': args.env,
+            'seed': int(seeds[process_idx]),
+            'monitor': args.monitor,
+            'render': args.render,
+            'outdir': args.outdir,
+            'in_subprocess': in_subprocess,
+        }
 
     def make_batch_env(test):
-        return chainerrl.envs.MultiprocessVectorEnv(
-            [functools.partial(make_env, idx, test)
-             for idx, env in enumerate(range(args.num_envs))])
+        if args.num_envs <= 4:
+            # for a handful of cheap MuJoCo envs the subprocess round-trip
+            # costs more than the parallelism buys; step them in-process
+            return chainerrl.envs.SerialVectorEnv(
+                [_make_env(env_config(idx, test))
+                 for idx in range(args.num_envs)])
+        # ShmemVectorEnv exchanges observations through shared memory
+        # instead of pickling them through pipes on every step
+        # pin_memory makes the returned observations page-locked so the
+        # agent's host-to-device upload runs as a DMA
+        return chainerrl.envs.ShmemVectorEnv(
+            [functools.partial(
+                _make_env, env_config(idx, test, in_subprocess=True))
+             for idx in range(args.num_envs)],
+            pin_memory=args.gpu >= 0)
 
     # Only for getting timesteps, and obs-action spaces
     sample_env = gym.make(args.env)
@@ -122,33 +211,87 @@ def main():
     winit_last = chainerrl.initializers.Orthogonal(1e-2)
 
     action_size = action_space.low.size
-    policy = chainer.Sequential(
+    policy_trunk_layers = [
         L.Linear(None, 64, initialW=winit),
         F.tanh,
         L.Linear(None, 64, initialW=winit),
         F.tanh,
         L.Linear(None, action_size, initialW=winit_last),
-        chainerrl.policies.GaussianHeadWithStateIndependentCovariance(
-            action_size=action_size,
-            var_type='diagonal',
-            var_func=lambda x: F.exp(2 * x),  # Parameterize log std
-            var_param_init=0,  # log std = 0 => std = 1
-        ),
+    ]
+    if args.mixed16:
+        # upcast before exp: exp(2x) overflows fp16 already at x ~ 5.5
+        def var_func(x):
+            return chainerrl.functions.exp2x(F.cast(x, np.float32))
+    else:
+        # fused exp(2 * x): one kernel instead of mul + exp
+        var_func = chainerrl.functions.exp2x
+    gaussian_head = chainerrl.policies.GaussianHeadWithStateIndependentCovariance(  # NOQA
+        action_size=action_size,
+        var_type='diagonal',
+        var_func=var_func,  # Parameterize log std
+        var_param_init=0,  # log std = 0 => std = 1
     )
-
-    vf = chainer.Sequential(
+    vf_layers = [
         L.Linear(None, 64, initialW=winit),
         F.tanh,
         L.Linear(None, 64, initialW=winit),
         F.tanh,
         L.Linear(None, 1, initialW=winit),
-    )
+    ]
+    if args.mixed16:
+        # compute the trunks in fp16 but keep the agent-facing interface
+        # fp32: observations, normalizer stats, the Gaussian head's
+        # distribution math and the losses are all fp32, so cast on the
+        # way into and out of the trunks
+        def cast_in(x):
+            return F.cast(x, chainer.get_dtype())
+
+        def cast_out(x):
+            return F.cast(x, np.float32)
+
+        policy_trunk_layers = [cast_in] + policy_trunk_layers + [cast_out]
+        vf_layers = [cast_in] + vf_layers + [cast_out]
+    if args.static_graph:
+        # The Gaussian head returns a distribution object rather than a
+        # Variable, so only the trunks are captured. Note that nesting
+        # the trunk changes parameter paths, so snapshots are not
+        # interchangeable with the non-static layout.
+        policy = chainer.Sequential(
+            StaticSequential(*policy_trunk_layers), gaussian_head)
+        vf = StaticSequential(*vf_layers)
+    else:
+        policy = chainer.Sequential(*(policy_trunk_layers + [gaussian_head]))
+        vf = chainer.Sequential(*vf_layers)
 
     # Combine a policy and a value function into a single model
-    model = chainerrl.links.Branched(policy, vf)
+    if args.fused_first_layer:
+        assert not args.static_graph and not args.mixed16, \
+            '--fused-first-layer cannot be combined with' \
+            ' --static-graph or --mixed16'
+        model = FusedFirstLayerBranched(
+            L.Linear(None, 2 * 64, initialW=winit),
+            chainer.Sequential(
+                L.Linear(None, 64, initialW=winit),
+                F.tanh,
+                L.Linear(None, action_size, initialW=winit_last),
+                gaussian_head,
+            ),
+            chainer.Sequential(
+                L.Linear(None, 64, initialW=winit),
+                F.tanh,
+                L.Linear(None, 1, initialW=winit),
+            ))
+    else:
+        model = chainerrl.links.Branched(policy, vf)
 
-    opt = chainer.optimizers.Adam(3e-4, eps=1e-5)
+    if args.factored_adam:
+        opt = chainerrl.optimizers.FactoredAdam(3e-4, eps=1e-5)
+    else:
+        opt = chainer.optimizers.Adam(3e-4, eps=1e-5)
     opt.setup(model)
+    if args.mixed16:
+        # loss scaling keeps small fp16 gradients from flushing to zero
+        opt.loss_scaling()
 
     agent = PPO(
         model,
@@ -163,6 +306,7 @@ def main():
         standardize_advantages=True,
         gamma=0.995,
         lambd=0.97,
+        use_soa_buffer=True,
     )
 
     if args.load:
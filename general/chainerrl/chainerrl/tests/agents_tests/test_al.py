@@ -1,11 +1,3 @@
-from __future__ import unicode_literals
-from __future__ import print_function
-from __future__ import division
-from __future__ import absolute_import
-from future import standard_library
-from builtins import *  # NOQA
-standard_library.install_aliases()  # NOQA
-
 import basetest_dqn_like as base
 from basetest_training import _TestBatchTrainingMixin
 from chainerrl.agents.al import AL
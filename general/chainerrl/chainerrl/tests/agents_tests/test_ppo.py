@@ -281,6 +281,7 @@ class TestPPODataset(unittest.TestCase):
         'standardize_advantages': [False, True],
         'episodic': [True, False],
         'recurrent': [False],
+        'use_soa_buffer': [False, True],
     })
     +
     testing.product({
@@ -290,6 +291,7 @@ class TestPPODataset(unittest.TestCase):
         'standardize_advantages': [True],
         'episodic': [True, False],
         'recurrent': [True],
+        'use_soa_buffer': [False],
     })
 ))
 class TestPPO(unittest.TestCase):
@@ -443,6 +445,7 @@ class TestPPO(unittest.TestCase):
             clip_eps_vf=self.clip_eps_vf,
             standardize_advantages=self.standardize_advantages,
             recurrent=self.recurrent,
+            use_soa_buffer=self.use_soa_buffer,
             entropy_coef=1e-5,
             act_deterministically=True,
         )
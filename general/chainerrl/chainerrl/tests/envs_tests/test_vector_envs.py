@@ -19,7 +19,8 @@ import chainerrl
     'num_envs': [1, 2, 3],
     'env_id': ['CartPole-v0', 'Pendulum-v0'],
     'random_seed_offset': [0, 100],
-    'vector_env_to_test': ['SerialVectorEnv', 'MultiprocessVectorEnv'],
+    'vector_env_to_test': ['SerialVectorEnv', 'MultiprocessVectorEnv',
+                           'ShmemVectorEnv'],
 }))
 class TestSerialVectorEnv(unittest.TestCase):
 
@@ -32,6 +33,10 @@ class TestSerialVectorEnv(unittest.TestCase):
             self.vec_env = chainerrl.envs.MultiprocessVectorEnv(
                 [(lambda: gym.make(self.env_id))
                  for _ in range(self.num_envs)])
+        elif self.vector_env_to_test == 'ShmemVectorEnv':
+            self.vec_env = chainerrl.envs.ShmemVectorEnv(
+                [(lambda: gym.make(self.env_id))
+                 for _ in range(self.num_envs)])
         else:
             assert False
         # Init envs to compare against
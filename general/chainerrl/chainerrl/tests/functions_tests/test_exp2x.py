@@ -0,0 +1,59 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+import unittest
+
+import numpy
+
+import chainer
+from chainer import cuda
+from chainer import gradient_check
+from chainer import testing
+from chainer.testing import attr
+
+import chainerrl
+
+
+@testing.parameterize(
+    *testing.product({
+        'shape': [(1,), (3,), (2, 3), (1, 1)],
+    })
+)
+class TestExp2x(unittest.TestCase):
+
+    def setUp(self):
+        self.x = numpy.random.uniform(
+            -1, 1, self.shape).astype(numpy.float32)
+        self.gy = numpy.random.uniform(
+            -1, 1, self.shape).astype(numpy.float32)
+
+    def check_forward(self, x):
+        y = chainerrl.functions.exp2x(x)
+        correct_y = numpy.exp(2 * self.x)
+        gradient_check.assert_allclose(correct_y, cuda.to_cpu(y.array))
+
+    def test_forward_cpu(self):
+        self.check_forward(self.x)
+
+    @attr.gpu
+    def test_forward_gpu(self):
+        self.check_forward(chainer.cuda.to_gpu(self.x))
+
+    def check_backward(self, x_data, y_grad):
+        gradient_check.check_backward(
+            chainerrl.functions.Exp2x(),
+            x_data, y_grad, eps=1e-3, rtol=1e-2)
+
+    def test_backward_cpu(self):
+        self.check_backward(self.x, self.gy)
+
+    @attr.gpu
+    def test_backward_gpu(self):
+        self.check_backward(
+            chainer.cuda.to_gpu(self.x), cuda.to_gpu(self.gy))
+
+
+testing.run_module(__name__, __file__)
@@ -15,18 +15,22 @@ from chainer.testing import condition
 from chainerrl.misc import prioritized
 
 
-@testing.parameterize(
-    {'uniform_ratio': 0, 'expected_corr_range': (0.9, 1)},
-    {'uniform_ratio': 0.7, 'expected_corr_range': (0.5, 0.85)},
-    {'uniform_ratio': 1, 'expected_corr_range': (-0.3, 0.3)},
-)
+@testing.parameterize(*(
+    [dict(params, impl=impl)
+     for params in [
+         {'uniform_ratio': 0, 'expected_corr_range': (0.9, 1)},
+         {'uniform_ratio': 0.7, 'expected_corr_range': (0.5, 0.85)},
+         {'uniform_ratio': 1, 'expected_corr_range': (-0.3, 0.3)},
+     ]
+     for impl in ['PrioritizedBuffer', 'FlatPrioritizedBuffer']]
+))
 class TestPrioritizedBuffer(unittest.TestCase):
 
     @condition.retry(2)
     def test_convergence(self):
         size = 100
 
-        buf = prioritized.PrioritizedBuffer(capacity=size)
+        buf = getattr(prioritized, self.impl)(capacity=size)
         for x in range(size):
             buf.append(x)
 
@@ -73,12 +77,13 @@ class TestPrioritizedBuffer(unittest.TestCase):
         'wait_priority_after_sampling': [True, False],
         'initial_priority': [0.1, 1],
         'uniform_ratio': [0, 0.1, 1],
+        'impl': ['PrioritizedBuffer', 'FlatPrioritizedBuffer'],
     })
 )
 class TestPrioritizedBufferFlooding(unittest.TestCase):
 
     def test_flood(self):
-        buf = prioritized.PrioritizedBuffer(
+        buf = getattr(prioritized, self.impl)(
             capacity=self.capacity,
             wait_priority_after_sampling=self.wait_priority_after_sampling)
         for _ in range(100):
@@ -94,6 +99,36 @@ class TestPrioritizedBufferFlooding(unittest.TestCase):
                     buf.set_last_priority([1.0] * n)
 
 
+class TestFlatPrioritizedBufferRingWrap(unittest.TestCase):
+
+    def test_ring_wrap(self):
+        capacity = 7
+        buf = prioritized.FlatPrioritizedBuffer(capacity=capacity)
+        for x in range(3 * capacity):
+            buf.append(x)
+            self.assertEqual(len(buf), min(x + 1, capacity))
+            live = set(range(max(0, x + 1 - capacity), x + 1))
+            n = random.randrange(1, len(buf) + 1)
+            sampled, probabilities, min_prob = buf.sample(n)
+            # only the newest `capacity` elements may be sampled
+            self.assertTrue(set(sampled) <= live)
+            self.assertEqual(len(sampled), len(set(sampled)))
+            for p in probabilities:
+                self.assertGreater(p, 0)
+                self.assertGreaterEqual(p, min_prob)
+            buf.set_last_priority(
+                [random.uniform(0.1, 1.0) for _ in range(n)])
+
+    def test_popleft(self):
+        capacity = 5
+        buf = prioritized.FlatPrioritizedBuffer(capacity=capacity)
+        for x in range(capacity):
+            buf.append(x)
+        for x in range(capacity):
+            self.assertEqual(buf.popleft(), x)
+            self.assertEqual(len(buf), capacity - x - 1)
+
+
 class TestSumTree(unittest.TestCase):
 
     def test_read_write(self):